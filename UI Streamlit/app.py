@@ -1,94 +1,59 @@
 import streamlit as st
-import numpy as np
-import cv2
 from PIL import Image
 import os
 import time
 
-from skimage.measure import shannon_entropy
-
 # ==============================
 # IMPORT MODULE ML
 # ==============================
-from modules.pipeline import predict_image, get_class_names
+# Modul ringan dan validasi di sini; pipeline (XGBoost, model) diimpor sekali
+# per proses server lewat load_pipeline() agar halaman tampil lebih cepat
 from modules.utils import CLASS_MAP, CLASS_COLORS, CLASS_DESCRIPTIONS
+from modules.validation import is_prediction_confident
 
-# ==============================
-# KONFIGURASI HALAMAN
-# ==============================
-st.set_page_config(
-    page_title="CornShield - Deteksi Penyakit Daun Jagung",
-    page_icon="🌽",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# ==============================
-# PARAMETER VALIDASI (FINAL)
-# ==============================
-CONF_THRESHOLD = 0.55
-MIN_AREA_RATIO = 0.05
-MIN_GREEN_RATIO = 0.15
-MIN_ENTROPY = 3.0
-MAX_ENTROPY = 8.8
-MAX_GRAY_RATIO_ON_LEAF = 0.85
-MIN_CONF_MARGIN = 0.10
-
-# ==============================
-# FUNGSI VALIDASI
-# ==============================
-def is_green_dominant_hsv(image):
-    img_rgb = np.array(image.convert("RGB"))
-    img_hsv = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2HSV)
-
-    lower_green = np.array([25, 40, 40])
-    upper_green = np.array([95, 255, 255])
-
-    mask = cv2.inRange(img_hsv, lower_green, upper_green)
-    return (np.sum(mask > 0) / mask.size) >= MIN_GREEN_RATIO
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DIR = os.path.join(BASE_DIR, "assets", "sample_images")
 
 
-def is_valid_texture(image):
-    gray = np.array(image.convert("L"))
-    entropy = shannon_entropy(gray)
-    return MIN_ENTROPY <= entropy <= MAX_ENTROPY
-
-
-def is_valid_segmentation(segmentation):
-    total_pixels = segmentation.size
-    leaf_pixels = np.sum(segmentation > 0)
-    return (leaf_pixels / total_pixels) >= MIN_AREA_RATIO
-
-
-def is_mostly_grayscale_on_leaf(image, segmentation):
-    """
-    FIX UTAMA:
-    - Resize image ke ukuran segmentation
-    - Hindari mismatch (480x640 vs 256x256)
+@st.cache_resource(show_spinner=False)
+def load_pipeline():
     """
-    seg_h, seg_w = segmentation.shape
-    image_resized = image.resize((seg_w, seg_h))
+    Import the pipeline, load the model and warm up the extractors.
 
-    img_rgb = np.array(image_resized.convert("RGB"))
-    img_hsv = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2HSV)
-    s_channel = img_hsv[:, :, 1]
+    Cached for the lifetime of the Streamlit server, so only the first
+    session pays the cold start and later reruns reuse the warm pipeline.
 
-    leaf_mask = segmentation > 0
-    if np.sum(leaf_mask) == 0:
-        return True
+    Returns:
+        tuple: (pipeline module, boot info dict with import/warm-up seconds
+        and the model version)
+    """
+    t0 = time.perf_counter()
+    from modules import pipeline
+    import_seconds = time.perf_counter() - t0
 
-    gray_leaf_pixels = np.sum((s_channel < 30) & leaf_mask)
-    total_leaf_pixels = np.sum(leaf_mask)
+    boot = pipeline.warm_up()
+    boot["import_seconds"] = import_seconds
+    boot["total_seconds"] = time.perf_counter() - t0
+    return pipeline, boot
 
-    ratio = gray_leaf_pixels / total_leaf_pixels
-    return ratio > MAX_GRAY_RATIO_ON_LEAF
 
+@st.cache_data(show_spinner=False)
+def list_samples(sample_dir):
+    """Sample image file names (listed once, not on every rerun)."""
+    if not os.path.exists(sample_dir):
+        return []
+    return sorted(f for f in os.listdir(sample_dir)
+                  if f.lower().endswith((".jpg", ".jpeg", ".png")))
 
-def is_prediction_confident(probabilities):
-    probs_sorted = np.sort(probabilities)
-    top = probs_sorted[-1]
-    second = probs_sorted[-2]
-    return top >= CONF_THRESHOLD and (top - second) >= MIN_CONF_MARGIN
+# ==============================
+# KONFIGURASI HALAMAN
+# ==============================
+st.set_page_config(
+    page_title="CornShield - Deteksi Penyakit Daun Jagung",
+    page_icon="🌽",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
 
 # ==============================
 # CSS
@@ -147,14 +112,7 @@ with st.sidebar:
     st.caption("Final Project Machine Learning 2025")
     st.markdown("---")
 
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    sample_dir = os.path.join(base_dir, "assets", "sample_images")
-
-    samples = ["Tidak Ada"]
-    if os.path.exists(sample_dir):
-        samples += [f for f in os.listdir(sample_dir)
-                    if f.lower().endswith((".jpg", ".jpeg", ".png"))]
-
+    samples = ["Tidak Ada"] + list_samples(SAMPLE_DIR)
     selected_sample = st.selectbox("🖼️ Coba Gambar Sampel", samples)
 
     st.markdown("---")
@@ -189,36 +147,48 @@ with col2:
     - Cahaya cukup
     """)
 
+# ==============================
+# WARM-UP (sekali per proses server)
+# ==============================
+with st.spinner("⏳ Menyiapkan model..."):
+    pipeline, boot = load_pipeline()
+
+# Tempat statistik di sidebar; diisi setelah prediksi agar tidak tertinggal satu request
+stats_slot = st.sidebar.empty()
+
+
+def render_stats():
+    """Fill the sidebar statistics with the gate counters, including the current image."""
+    with stats_slot.container():
+        with st.expander("📈 Statistik Validasi"):
+            stats = pipeline.get_gate_stats()
+            st.caption(f"Total citra: {stats['runs']}")
+            st.caption(f"Warm-up: {boot['total_seconds']:.2f} s "
+                       f"(impor {boot['import_seconds']:.2f} s) · model {boot['model_version']}")
+            st.json(stats, expanded=False)
+
+
 image = None
 if uploaded_file:
     image = Image.open(uploaded_file)
 elif selected_sample != "Tidak Ada":
-    image = Image.open(os.path.join(sample_dir, selected_sample))
+    image = Image.open(os.path.join(SAMPLE_DIR, selected_sample))
 
 # ==============================
 # PROSES
 # ==============================
 if image:
+    # VALIDASI BERURUTAN (FINAL): gate termurah dulu, ekstraksi fitur
+    # hanya dijalankan jika semua gate lolos
     with st.spinner("🔬 Menganalisis citra..."):
-        time.sleep(0.5)
-        pred_class, probs, segmentation, confidence = predict_image(image)
+        verdict, prediction = pipeline.predict_image_gated(image)
+    render_stats()
 
-    # VALIDASI BERURUTAN (FINAL)
-    if not is_green_dominant_hsv(image):
-        st.error("❌ Objek tidak dikenali (warna hijau tidak dominan)")
+    if not verdict.passed:
+        st.error(verdict.message)
         st.stop()
 
-    if not is_valid_texture(image):
-        st.error("❌ Tekstur tidak menyerupai daun alami")
-        st.stop()
-
-    if not is_valid_segmentation(segmentation):
-        st.error("❌ Segmentasi daun gagal")
-        st.stop()
-
-    if is_mostly_grayscale_on_leaf(image, segmentation):
-        st.error("❌ Daun terlalu pucat / rusak parah")
-        st.stop()
+    pred_class, probs, segmentation, confidence = prediction
 
     if not is_prediction_confident(probs):
         st.warning("""
@@ -243,7 +213,7 @@ if image:
         st.markdown('</div>', unsafe_allow_html=True)
 
     with right:
-        conf_pct = np.max(probs) * 100
+        conf_pct = confidence * 100
         color = CLASS_COLORS[pred_class]
 
         st.markdown(f"""
@@ -260,11 +230,12 @@ if image:
 
         st.markdown('<div class="custom-card">', unsafe_allow_html=True)
         st.subheader("📊 Distribusi Probabilitas")
-        for cls, p in zip(get_class_names(), probs):
+        for cls, p in zip(pipeline.get_class_names(), probs):
             st.progress(float(p), text=f"{cls} – {p*100:.1f}%")
         st.markdown('</div>', unsafe_allow_html=True)
 
 else:
+    render_stats()
     st.info("Silakan unggah citra daun jagung untuk memulai analisis.")
 
 st.markdown('<div class="content-spacer"></div>', unsafe_allow_html=True)
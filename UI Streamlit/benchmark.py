@@ -0,0 +1,626 @@
+"""
+Benchmark suite for the corn leaf disease classification pipeline.
+
+Measures every stage of the inference pipeline (preprocess_pil_image,
+segment_otsu, the three feature extractors, the full and leaf-restricted
+feature modes, predict_proba) and the full
+pipeline at several image sizes, on deterministic synthetic leaf images
+and on a fixed sample of the ``data jagung/validation`` dataset. The model
+formats are compared too: load time and per-row/batch latency of the
+pickled XGBClassifier, the native booster with inplace_predict and the
+pure-NumPy TreeEnsemble. Large JPEG uploads are measured with a full
+decode versus decode-time downscaling (PIL draft). The Fine and DOR
+extractors are measured on every available feature backend (NumPy, and
+Numba when installed), and ``--check-backends`` verifies that all
+backends produce identical features. ``--check-reference`` compares the
+Fine and DOR histograms of every backend bit for bit with the original
+per-pixel loops on random and flat images. Tiled inference of large uploads is
+measured with per-tile extraction and with the integral-histogram engine
+(``modules.integral_features``), at the default and at a dense stride.
+
+For every case the median wall time, peak Python/NumPy allocations
+(tracemalloc) and throughput are recorded. Each run is appended to a JSON
+history file and compared with a stored baseline; the script exits with
+status 1 when a case is slower than the baseline by more than the
+allowed threshold.
+
+Usage:
+    python benchmark.py                         # run, append history, compare
+    python benchmark.py --save-baseline         # store this run as the baseline
+    python benchmark.py --sizes 256 --repeat 10 --threshold 0.25
+    python benchmark.py --check-backends        # exit 1 if the backends disagree
+    python benchmark.py --check-reference       # exit 1 if they differ from the per-pixel loops
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from modules.preprocessing import preprocess_pil_image, preprocess_rgb_image
+from modules.segmentation import segment_otsu
+from modules import feature_extraction
+from modules.feature_extraction import (
+    extract_fine_features,
+    extract_coarse_features,
+    extract_dor_features,
+    extract_features,
+    FeatureBuffers,
+)
+from modules.feature_jit import NUMBA_AVAILABLE
+from modules.integral_features import IntegralFeatures
+from modules.pipeline import load_model, predict_image, predict_image_tiled
+from modules.model_io import (
+    NATIVE_MODEL_PATH, PICKLE_MODEL_PATH, load_native_model, load_pickle_model,
+)
+from modules.tree_ensemble import TreeEnsemble
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = os.path.join(BASE_DIR, "benchmarks")
+DATASET_DIR = os.path.join(BASE_DIR, "..", "data jagung", "validation")
+
+DEFAULT_SIZES = (128, 256, 512)
+LARGE_INPUT_SIZES = (1500, 3000, 3840)
+# Stride tile rapat (sliding window) untuk membandingkan engine tile
+DENSE_TILE_STRIDE = 64
+DEFAULT_HISTORY = os.path.join(BENCH_DIR, "history.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+
+# ==============================
+# DATA
+# ==============================
+def synthetic_leaf(size, seed=0):
+    """
+    Deterministic synthetic leaf image: a textured green ellipse with
+    brown lesions on a white background.
+
+    Args:
+        size: Image width and height in pixels
+        seed: Random seed
+
+    Returns:
+        PIL Image (RGB)
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size] / size
+    leaf = ((xx - 0.5) / 0.45) ** 2 + ((yy - 0.5) / 0.2) ** 2 <= 1.0
+
+    img = np.full((size, size, 3), 245, dtype=np.uint8)
+    texture = rng.normal(0, 18, (size, size))
+    img[leaf, 0] = np.clip(60 + texture[leaf], 0, 255)
+    img[leaf, 1] = np.clip(150 + texture[leaf], 0, 255)
+    img[leaf, 2] = np.clip(50 + texture[leaf] / 2, 0, 255)
+
+    for _ in range(8):
+        cy, cx = rng.uniform(0.35, 0.65), rng.uniform(0.15, 0.85)
+        r = rng.uniform(0.01, 0.04)
+        lesion = leaf & (((xx - cx) ** 2 + (yy - cy) ** 2) <= r ** 2)
+        img[lesion] = (120, 80, 40)
+
+    return Image.fromarray(img)
+
+
+def dataset_sample(per_class=2, dataset_dir=DATASET_DIR):
+    """
+    Fixed sample of the validation dataset: the first ``per_class`` files
+    (sorted by name) of every class folder.
+
+    Returns:
+        list of (path, PIL Image)
+    """
+    sample = []
+    for class_dir in sorted(glob.glob(os.path.join(dataset_dir, "*"))):
+        files = sorted(f for f in glob.glob(os.path.join(class_dir, "*"))
+                       if f.lower().endswith((".jpg", ".jpeg", ".png")))
+        for path in files[:per_class]:
+            img = Image.open(path)
+            img.load()
+            sample.append((path, img))
+    return sample
+
+
+# ==============================
+# MEASUREMENT
+# ==============================
+def measure(fn, repeat=5, warmup=1):
+    """
+    Time a zero-argument callable.
+
+    Returns:
+        dict with median/min wall time (s), peak traced allocation (bytes)
+        and throughput (calls per second)
+    """
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    # Alokasi diukur terpisah karena tracemalloc memperlambat eksekusi
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "median_s": median,
+        "min_s": min(times),
+        "peak_alloc_bytes": peak,
+        "throughput_per_s": (1.0 / median) if median > 0 else float("inf"),
+        "repeat": repeat,
+    }
+
+
+def stage_cases(pil_image, size):
+    """
+    Benchmark cases of one input image at one working size.
+
+    Returns:
+        list of (stage name, zero-argument callable)
+    """
+    target = (size, size)
+    gray = preprocess_pil_image(pil_image, target).gray
+    segmentation = segment_otsu(gray)
+    buffers = FeatureBuffers()
+    features = np.zeros((1, 313), dtype="float32")
+    model = load_model()
+
+    return [
+        ("preprocess_pil_image", lambda: preprocess_pil_image(pil_image, target)),
+        ("segment_otsu", lambda: segment_otsu(gray)),
+        ("extract_fine_features", lambda: extract_fine_features(gray)),
+        ("extract_coarse_features", lambda: extract_coarse_features(gray)),
+        ("extract_dor_features", lambda: extract_dor_features(gray)),
+        ("extract_features/full", lambda: extract_features(gray)),
+        ("extract_features/leaf", lambda: extract_features(gray, mode="leaf", segmentation=segmentation)),
+        ("extract_features/buffers", lambda: extract_features(gray, buffers=buffers)),
+        ("integral_features/full", lambda: IntegralFeatures(gray).features()),
+        ("predict_proba", lambda: model.predict_proba(features)),
+        ("pipeline", lambda: predict_image(pil_image)),
+    ]
+
+
+def available_backends():
+    """Feature backends that can run here ("numba" only when installed)."""
+    return [b for b in feature_extraction.FEATURE_BACKENDS if b != "numba" or NUMBA_AVAILABLE]
+
+
+def backend_cases(pil_image, size):
+    """
+    Benchmark cases of the texture extractors on every feature backend.
+
+    Returns:
+        list of (case name, zero-argument callable)
+    """
+    gray = preprocess_pil_image(pil_image, (size, size)).gray
+    buffers = FeatureBuffers()
+
+    def on(backend, fn):
+        def run():
+            previous = feature_extraction.set_backend(backend)
+            try:
+                return fn()
+            finally:
+                feature_extraction.set_backend(previous)
+        return run
+
+    cases = []
+    for backend in available_backends():
+        # Kompilasi JIT tidak ikut terukur (measure melakukan warmup)
+        cases += [
+            (f"extract_fine_features/{backend}", on(backend, lambda: extract_fine_features(gray))),
+            (f"extract_dor_features/{backend}", on(backend, lambda: extract_dor_features(gray))),
+            (f"extract_features/{backend}", on(backend, lambda: extract_features(gray, buffers=buffers))),
+        ]
+    return cases
+
+
+def check_backends(images, sizes=DEFAULT_SIZES):
+    """
+    Compare the features of every backend with the NumPy backend.
+
+    Both feature modes and non-default extractor parameters are checked.
+
+    Returns:
+        list of (image index, size, backend) that differ
+    """
+    def features(gray):
+        return np.concatenate([
+            extract_features(gray),
+            extract_features(gray, mode="leaf"),
+            extract_fine_features(gray, radius=2, neighbors=12, step=3),
+            extract_dor_features(gray, window_size=7),
+        ])
+
+    previous = feature_extraction.get_backend()
+    mismatches = []
+    try:
+        for i, img in enumerate(images):
+            for size in sizes:
+                gray = preprocess_pil_image(img, (size, size)).gray
+                feature_extraction.set_backend("numpy")
+                reference = features(gray)
+                for backend in available_backends():
+                    feature_extraction.set_backend(backend)
+                    if not np.array_equal(features(gray), reference):
+                        mismatches.append((i, size, backend))
+    finally:
+        feature_extraction.set_backend(previous)
+    return mismatches
+
+
+def reference_fine_features(gray, radius=1, neighbors=8, step=2):
+    """Original per-pixel LBP loop (reference for extract_fine_features)."""
+    h, w = gray.shape
+    codes = []
+
+    for y in range(radius, h - radius, step):
+        for x in range(radius, w - radius, step):
+            center = gray[y, x]
+            binary = []
+            for n in range(neighbors):
+                theta = 2 * np.pi * n / neighbors
+                yy = int(round(y + radius * np.sin(theta)))
+                xx = int(round(x + radius * np.cos(theta)))
+                binary.append(1 if gray[yy, xx] >= center else 0)
+
+            # Rotation invariant: take minimum rotation
+            rotations = [
+                int("".join(map(str, binary[i:] + binary[:i])), 2)
+                for i in range(neighbors)
+            ]
+            codes.append(min(rotations))
+
+    hist, _ = np.histogram(codes, bins=256, range=(0, 256))
+    hist = hist.astype("float32")
+    hist /= (hist.sum() + 1e-8)
+    return hist
+
+
+def reference_dor_features(gray, window_size=5):
+    """Original per-pixel DOR loop (reference for extract_dor_features)."""
+    pad = window_size // 2
+    padded = np.pad(gray.astype("float32"), pad, mode="reflect")
+    h, w = gray.shape
+    dom_idx = []
+
+    for y in range(h):
+        for x in range(w):
+            region = padded[y:y+window_size, x:x+window_size]
+            center = padded[y+pad, x+pad]
+
+            diffs = np.abs(region - center).flatten()
+            dom_idx.append(np.argmax(diffs))
+
+    num_pos = window_size * window_size
+    hist, _ = np.histogram(dom_idx, bins=num_pos, range=(0, num_pos))
+    hist = hist.astype("float32")
+    hist /= (hist.sum() + 1e-8)
+    return hist
+
+
+def reference_images(seed=0):
+    """
+    Small grayscale images for the reference check.
+
+    Random noise, a flat image and a two-level image (ties everywhere, so
+    the >= of LBP and the first-offset-wins rule of DOR are exercised),
+    plus a synthetic leaf, at odd and even sizes.
+
+    Returns:
+        list of (name, gray uint8)
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    for h, w in [(17, 23), (32, 32), (48, 41)]:
+        steps = np.full((h, w), 90, dtype=np.uint8)
+        steps[:, w // 2:] = 170
+        leaf = preprocess_pil_image(synthetic_leaf(256, seed), (w, h)).gray
+        images += [
+            (f"random_{h}x{w}", rng.integers(0, 256, (h, w), dtype=np.uint8)),
+            (f"flat_{h}x{w}", np.full((h, w), 128, dtype=np.uint8)),
+            (f"steps_{h}x{w}", steps),
+            (f"leaf_{h}x{w}", leaf),
+        ]
+    return images
+
+
+def check_reference(images=None):
+    """
+    Compare the Fine and DOR extractors of every backend with the per-pixel loops.
+
+    Default and non-default parameters are checked; the histograms must
+    be bit-identical.
+
+    Returns:
+        list of (image name, extractor, backend) that differ
+    """
+    params = {
+        "fine": [dict(), dict(radius=2, neighbors=12, step=3)],
+        "dor": [dict(), dict(window_size=3), dict(window_size=7)],
+    }
+    extractors = {
+        "fine": (extract_fine_features, reference_fine_features),
+        "dor": (extract_dor_features, reference_dor_features),
+    }
+
+    previous = feature_extraction.get_backend()
+    mismatches = []
+    try:
+        for name, gray in images if images is not None else reference_images():
+            for kind, (extract, reference) in extractors.items():
+                for kwargs in params[kind]:
+                    expected = reference(gray, **kwargs)
+                    label = kind + "".join(f",{k}={v}" for k, v in kwargs.items())
+                    for backend in available_backends():
+                        feature_extraction.set_backend(backend)
+                        if not np.array_equal(extract(gray, **kwargs), expected):
+                            mismatches.append((name, label, backend))
+    finally:
+        feature_extraction.set_backend(previous)
+    return mismatches
+
+
+def model_format_cases(batch_size=64):
+    """
+    Benchmark cases comparing the pickled and the native model format.
+
+    Returns:
+        list of (case name, zero-argument callable); empty when the
+        native model has not been exported
+    """
+    if not os.path.exists(NATIVE_MODEL_PATH):
+        return []
+
+    pickled = load_pickle_model(PICKLE_MODEL_PATH)
+    native = load_native_model(NATIVE_MODEL_PATH)
+    ensemble = TreeEnsemble.from_model(native)
+    rng = np.random.default_rng(0)
+    row = rng.random((1, 313), dtype=np.float32)
+    batch = rng.random((batch_size, 313), dtype=np.float32)
+
+    return [
+        ("load/pickle", lambda: load_pickle_model(PICKLE_MODEL_PATH)),
+        ("load/native", lambda: load_native_model(NATIVE_MODEL_PATH)),
+        ("predict_row/pickle", lambda: pickled.predict_proba(row)),
+        ("predict_row/native", lambda: native.predict_proba(row)),
+        ("predict_row/numpy", lambda: ensemble.predict_proba(row)),
+        (f"predict_batch{batch_size}/pickle", lambda: pickled.predict_proba(batch)),
+        (f"predict_batch{batch_size}/native", lambda: native.predict_proba(batch)),
+        (f"predict_batch{batch_size}/numpy", lambda: ensemble.predict_proba(batch)),
+    ]
+
+
+def large_input_cases(size):
+    """
+    Benchmark cases of ingesting a large JPEG upload (encoded bytes).
+
+    Returns:
+        list of (case name, zero-argument callable)
+    """
+    buf = io.BytesIO()
+    synthetic_leaf(size).save(buf, "JPEG", quality=90)
+    data = buf.getvalue()
+
+    def full_decode():
+        img_rgb = np.array(Image.open(io.BytesIO(data)).convert("RGB"))
+        return preprocess_rgb_image(img_rgb)
+
+    return [
+        ("ingest_full", full_decode),
+        ("ingest_reduced", lambda: preprocess_pil_image(data)),
+        ("pipeline_large", lambda: predict_image(Image.open(io.BytesIO(data)))),
+        ("pipeline_tiled", lambda: predict_image_tiled(data, engine="tiles")),
+        ("pipeline_tiled/integral", lambda: predict_image_tiled(data, engine="integral")),
+        ("pipeline_tiled_dense", lambda: predict_image_tiled(data, stride=DENSE_TILE_STRIDE, engine="tiles")),
+        ("pipeline_tiled_dense/integral",
+         lambda: predict_image_tiled(data, stride=DENSE_TILE_STRIDE, engine="integral")),
+    ]
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat=5, use_dataset=True, per_class=2):
+    """
+    Run every benchmark case.
+
+    Returns:
+        dict case name -> measurement, where the case name is
+        ``"<stage>@<size>/<input>"``
+    """
+    results = {}
+
+    for case, fn in model_format_cases():
+        results[f"model_{case}"] = measure(fn, repeat)
+
+    for size in LARGE_INPUT_SIZES:
+        for case, fn in large_input_cases(size):
+            results[f"{case}@{size}/jpeg"] = measure(fn, repeat)
+
+    for size in sizes:
+        for stage, fn in stage_cases(synthetic_leaf(size), size):
+            results[f"{stage}@{size}/synthetic"] = measure(fn, repeat)
+        for case, fn in backend_cases(synthetic_leaf(size), size):
+            results[f"backend_{case}@{size}/synthetic"] = measure(fn, repeat)
+
+    if use_dataset:
+        sample = dataset_sample(per_class)
+        if sample:
+            for size in sizes:
+                per_stage = {}
+                for _, img in sample:
+                    for stage, fn in stage_cases(img, size):
+                        per_stage.setdefault(stage, []).append(measure(fn, repeat))
+                for stage, runs in per_stage.items():
+                    results[f"{stage}@{size}/dataset"] = _mean_measurement(runs)
+
+    return results
+
+
+def _mean_measurement(runs):
+    median = statistics.mean(r["median_s"] for r in runs)
+    return {
+        "median_s": median,
+        "min_s": min(r["min_s"] for r in runs),
+        "peak_alloc_bytes": max(r["peak_alloc_bytes"] for r in runs),
+        "throughput_per_s": (1.0 / median) if median > 0 else float("inf"),
+        "repeat": runs[0]["repeat"],
+        "images": len(runs),
+    }
+
+
+# ==============================
+# HISTORY & BASELINE
+# ==============================
+def environment_info():
+    import cv2
+    import xgboost
+
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "xgboost": xgboost.__version__,
+        "numba": numba_version,
+        "feature_backend": feature_extraction.get_backend(),
+    }
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def compare_with_baseline(results, baseline, threshold, min_delta_s=0.0005):
+    """
+    Find cases slower than the baseline by more than ``threshold``.
+
+    Slowdowns smaller than ``min_delta_s`` in absolute terms are ignored, so
+    timer noise on sub-millisecond stages does not fail the run.
+
+    Returns:
+        list of (case, baseline median, current median, relative slowdown)
+    """
+    regressions = []
+    for case, current in results.items():
+        base = baseline.get(case)
+        if base is None or base["median_s"] <= 0:
+            continue
+        slowdown = current["median_s"] / base["median_s"] - 1.0
+        if slowdown > threshold and current["median_s"] - base["median_s"] > min_delta_s:
+            regressions.append((case, base["median_s"], current["median_s"], slowdown))
+    return regressions
+
+
+def print_results(results):
+    print(f"{'case':<48} {'median ms':>10} {'peak KiB':>10} {'ops/s':>10}")
+    for case, r in results.items():
+        print(f"{case:<48} {r['median_s'] * 1000:>10.2f} "
+              f"{r['peak_alloc_bytes'] / 1024:>10.1f} {r['throughput_per_s']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the corn leaf pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--per-class", type=int, default=2,
+                        help="Dataset images per class in the fixed sample")
+    parser.add_argument("--no-dataset", action="store_true",
+                        help="Only benchmark synthetic images")
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative slowdown vs. the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check-backends", action="store_true",
+                        help="Only check that every feature backend gives identical features")
+    parser.add_argument("--check-reference", action="store_true",
+                        help="Only check the Fine and DOR extractors against the per-pixel loops")
+    args = parser.parse_args(argv)
+
+    if args.check_reference:
+        images = reference_images()
+        mismatches = check_reference(images)
+        print(f"Reference checked: {', '.join(available_backends())} on {len(images)} images")
+        for name, label, backend in mismatches:
+            print(f"  MISMATCH {name} [{label}]: {backend}")
+        return 1 if mismatches else 0
+
+    if args.check_backends:
+        images = [synthetic_leaf(size, seed) for seed, size in enumerate(args.sizes)]
+        if not args.no_dataset:
+            images += [img for _, img in dataset_sample(args.per_class)]
+        mismatches = check_backends(images, args.sizes)
+        print(f"Backends checked: {', '.join(available_backends())} on {len(images)} images")
+        for i, size, backend in mismatches:
+            print(f"  MISMATCH image {i} @ {size}: {backend}")
+        return 1 if mismatches else 0
+
+    results = run_suite(args.sizes, args.repeat, not args.no_dataset, args.per_class)
+    print_results(results)
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment_info(),
+        "results": results,
+    }
+    history = load_json(args.history, [])
+    history.append(record)
+    save_json(args.history, history)
+
+    if args.save_baseline:
+        save_json(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_json(args.baseline, None)
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    regressions = compare_with_baseline(results, baseline, args.threshold,
+                                        args.min_delta_ms / 1000.0)
+    if regressions:
+        print(f"\nREGRESSION (> {args.threshold:.0%} slower than baseline):")
+        for case, base, current, slowdown in regressions:
+            print(f"  {case}: {base * 1000:.2f} ms -> {current * 1000:.2f} ms (+{slowdown:.0%})")
+        return 1
+
+    print("\nNo regression against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
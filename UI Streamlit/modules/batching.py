@@ -0,0 +1,253 @@
+"""
+Deadline-aware dynamic micro-batching for corn leaf disease inference.
+
+Concurrent callers submit single images to a MicroBatcher. The batcher
+collects requests into a window that closes when ``max_batch_size``
+requests are waiting, when ``max_wait_ms`` has passed since the first
+request of the window, or early enough before the earliest per-request
+deadline for the batch to be scored in time (running estimate of the
+batch latency).
+Gating and feature extraction of the window run in parallel on a worker
+pool, followed by one batched ``predict_proba`` call. Every caller gets
+its own result back through an asyncio future.
+
+Example:
+    batcher = MicroBatcher(max_batch_size=16, max_wait_ms=10)
+    await batcher.start()
+    verdict, prediction = await batcher.submit(image_bytes, timeout=2.0)
+    print(batcher.stats())
+    await batcher.stop()
+"""
+
+import asyncio
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .pipeline import get_model, prepare_features, score_features, prediction_dict
+
+# Margin minimum sebelum deadline saat belum ada estimasi latensi batch (detik)
+MIN_DEADLINE_MARGIN = 0.005
+
+# Bobot sampel baru pada rata-rata bergerak latensi batch
+LATENCY_SMOOTHING = 0.2
+
+
+class MicroBatcher:
+    """
+    Asyncio micro-batcher in front of the prediction pipeline.
+
+    Args:
+        max_batch_size: Maximum number of requests scored per model call
+        max_wait_ms: Maximum time a window stays open after its first request
+        n_workers: Worker threads for gating and feature extraction
+            (default: os.cpu_count())
+        cascade: GateCascade passed to the pipeline (default: module-wide cascade)
+    """
+
+    def __init__(self, max_batch_size=16, max_wait_ms=10, n_workers=None, cascade=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.cascade = cascade
+
+        self._queue = None
+        self._task = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self._requests = 0
+            self._batches = 0
+            self._expired = 0
+            self._batch_latency = None
+            self._max_queue_depth = 0
+            self._batch_sizes = Counter()
+
+    async def start(self):
+        """Start the batching loop on the running event loop."""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.n_workers,
+                                            thread_name_prefix="microbatch")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the loop; requests still queued are cancelled."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+        self._executor.shutdown(wait=True)
+        self._task = None
+
+    async def submit(self, source, timeout=None):
+        """
+        Queue one image and wait for its result.
+
+        Args:
+            source: PIL Image, file path or raw image bytes
+            timeout: Seconds until the request's deadline (None: no deadline)
+
+        Returns:
+            tuple: (verdict, prediction) as returned by predict_images_gated
+
+        Raises:
+            asyncio.TimeoutError: the deadline passed before the request was scored
+                (counted as ``expired`` in stats)
+        """
+        if self._task is None:
+            raise RuntimeError("MicroBatcher is not started")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        future = loop.create_future()
+        await self._queue.put((source, future, deadline))
+
+        with self._lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+
+        if deadline is None:
+            return await future
+        try:
+            return await asyncio.wait_for(future, timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            # Kadaluarsa di antrean (_run) maupun saat menunggu hasil
+            with self._lock:
+                self._expired += 1
+            raise
+
+    def _deadline_margin(self):
+        with self._lock:
+            latency = self._batch_latency
+        return max(latency or 0.0, MIN_DEADLINE_MARGIN)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        window_end = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Tutup window lebih awal dari deadline terdekat sebesar estimasi latensi batch
+            margin = self._deadline_margin()
+            deadlines = [d - margin for _, _, d in batch if d is not None]
+            close_at = min([window_end] + deadlines)
+            remaining = close_at - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+
+            now = loop.time()
+            live = []
+            for source, future, deadline in batch:
+                if future.done():
+                    continue
+                # Hanya request yang deadline-nya sudah lewat (tidak mungkin dilayani)
+                if deadline is not None and deadline <= now:
+                    future.set_exception(asyncio.TimeoutError())
+                    continue
+                live.append((source, future))
+            if not live:
+                continue
+
+            started = loop.time()
+            try:
+                await self._process(live)
+            except Exception as e:
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+            self._record_latency(loop.time() - started)
+
+    def _record_latency(self, seconds):
+        with self._lock:
+            if self._batch_latency is None:
+                self._batch_latency = seconds
+            else:
+                self._batch_latency += LATENCY_SMOOTHING * (seconds - self._batch_latency)
+
+    async def _process(self, live):
+        loop = asyncio.get_running_loop()
+        # Satu versi model per window: fitur diekstraksi dan dinilai oleh versi yang sama.
+        # Di executor: hot reload registry (stat + load) tidak memblokir event loop
+        entry = await loop.run_in_executor(self._executor, get_model)
+        prepared = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, prepare_features, source, self.cascade, None, entry)
+              for source, _ in live),
+            return_exceptions=True,
+        )
+
+        accepted = []
+        for (_, future), item in zip(live, prepared):
+            if not isinstance(item, BaseException) and item[1] is not None:
+                accepted.append((future, item[1]))
+
+        scored = {}
+        version = None
+        if accepted:
+            probabilities, version = await loop.run_in_executor(
+                self._executor, score_features, np.stack([feat for _, feat in accepted]), None, entry
+            )
+            scored = {id(future): probs for (future, _), probs in zip(accepted, probabilities)}
+
+        with self._lock:
+            self._batches += 1
+            self._batch_sizes[len(live)] += 1
+
+        for (_, future), item in zip(live, prepared):
+            if future.done():
+                continue
+            if isinstance(item, BaseException):
+                future.set_exception(item)
+                continue
+            verdict, features = item
+            prediction = (prediction_dict(scored[id(future)], model_version=version)
+                          if features is not None else None)
+            future.set_result((verdict, prediction))
+
+    def stats(self):
+        """
+        Snapshot of the batching metrics.
+
+        Returns:
+            dict with ``requests``, ``batches``, ``expired`` (requests that
+            raised TimeoutError), ``batch_latency_s`` (running estimate, None
+            before the first batch), current and maximum ``queue_depth`` and
+            ``batch_size_histogram`` (requests per batching window -> number
+            of windows)
+        """
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "expired": self._expired,
+                "batch_latency_s": self._batch_latency,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "max_queue_depth": self._max_queue_depth,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            }
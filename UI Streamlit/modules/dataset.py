@@ -0,0 +1,153 @@
+"""
+Dataset-level feature extraction for corn leaf disease classification.
+
+This module builds the feature matrix of a whole image dataset in parallel
+using a process pool. Output order always follows the input order, no
+matter which worker finishes first, and images that cannot be read are
+collected instead of being inserted as ``None``.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from .preprocessing import preprocess_image
+from .feature_extraction import DEFAULT_FEATURE_MODE, extract_features, thread_buffers
+
+try:
+    from tqdm.auto import tqdm
+except ImportError:
+    tqdm = None
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def scan_class_dirs(base_dir, extensions=IMAGE_EXTENSIONS):
+    """
+    List images stored as ``base_dir/<class>/<file>``.
+
+    Returns:
+        tuple: (paths, labels) sorted by class then file name
+    """
+    paths, labels = [], []
+    for class_name in sorted(os.listdir(base_dir)):
+        folder = os.path.join(base_dir, class_name)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith(extensions):
+                paths.append(os.path.join(folder, filename))
+                labels.append(class_name)
+    return paths, labels
+
+
+def image_path_to_vector(path, mode=DEFAULT_FEATURE_MODE):
+    """
+    Read an image from disk and compute its 313-dim feature vector.
+
+    Args:
+        path: Image file path
+        mode: Feature mode ("full" or "leaf"); bind it with functools.partial
+            to pass it as ``vectorize``
+
+    Returns:
+        features (np.ndarray) or None if the image cannot be read
+    """
+    img = cv2.imread(path)
+    if img is None:
+        return None
+
+    gray = preprocess_image(img).gray
+    # Buffer kerja ekstraktor dipakai ulang untuk semua gambar di worker ini
+    return extract_features(gray, mode=mode, buffers=thread_buffers())
+
+
+def _init_worker():
+    # Satu thread OpenCV per proses agar tidak terjadi oversubscription
+    cv2.setNumThreads(1)
+
+
+def _run_chunk(vectorize, chunk):
+    results = []
+    for idx, path in chunk:
+        try:
+            feat = vectorize(path)
+        except Exception:
+            feat = None
+        results.append((idx, feat))
+    return results
+
+
+def _pool_context():
+    # "fork" mewarisi fungsi yang didefinisikan di notebook / __main__
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def extract_dataset_features(paths, vectorize=image_path_to_vector, n_jobs=None,
+                             chunksize=16, progress=True, desc="Ekstraksi fitur", dtype="float32"):
+    """
+    Extract feature vectors for many images with a process pool.
+
+    Args:
+        paths: Sequence of image file paths
+        vectorize: Callable ``path -> feature vector or None``. Must be picklable
+            (module-level function).
+        n_jobs: Number of worker processes (default: os.cpu_count()). 1 runs
+            serially in the current process.
+        chunksize: Number of paths sent to a worker per task
+        progress: Show a tqdm progress bar (if tqdm is installed)
+        desc: Progress bar description
+        dtype: dtype of X (float32 for feature vectors)
+
+    Returns:
+        tuple: (X, kept_indices, failed_paths)
+            - X: Feature matrix (``dtype``) of the successfully read images, in input order
+            - kept_indices: Indices into ``paths`` of the rows of X
+            - failed_paths: Paths that could not be read or raised an error
+    """
+    paths = list(paths)
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1")
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+
+    indexed = list(enumerate(paths))
+    chunks = [indexed[i:i + chunksize] for i in range(0, len(indexed), chunksize)]
+    features = [None] * len(paths)
+
+    bar = tqdm(total=len(paths), desc=desc) if (progress and tqdm is not None) else None
+
+    def collect(results):
+        for idx, feat in results:
+            features[idx] = feat
+        if bar is not None:
+            bar.update(len(results))
+
+    try:
+        if n_jobs == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                collect(_run_chunk(vectorize, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=_pool_context(),
+                                     initializer=_init_worker) as executor:
+                futures = [executor.submit(_run_chunk, vectorize, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    collect(future.result())
+    finally:
+        if bar is not None:
+            bar.close()
+
+    kept_indices = np.array([i for i, f in enumerate(features) if f is not None], dtype=np.intp)
+    failed_paths = [paths[i] for i, f in enumerate(features) if f is None]
+
+    if len(kept_indices):
+        X = np.stack([features[i] for i in kept_indices]).astype(dtype)
+    else:
+        X = np.empty((0, 0), dtype=dtype)
+
+    return X, kept_indices, failed_paths
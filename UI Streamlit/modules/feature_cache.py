@@ -0,0 +1,192 @@
+"""
+Persistent feature cache for corn leaf disease classification.
+
+Feature vectors are stored on disk under a content-addressed key: the
+SHA-256 of the image bytes plus the extractor configuration and version.
+Changing the image, ``target_size`` or any extractor parameter therefore
+produces a different key, so stale vectors are never returned.
+
+The cache is bounded in size (least recently used entries are evicted
+first) and safe to share between processes: entries are written to a
+temporary file and moved into place atomically.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .feature_extraction import DEFAULT_FEATURE_MODE, FEATURE_CONFIG, FEATURE_MODES, FEATURE_VERSION
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cornshield", "features")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def feature_cache_config(target_size=(256, 256), mode=DEFAULT_FEATURE_MODE, **overrides):
+    """
+    Build the configuration that is hashed into every cache key.
+
+    Args:
+        target_size: Preprocessing target size (width, height)
+        mode: Feature mode ("full" or "leaf")
+        **overrides: Extractor parameters that differ from FEATURE_CONFIG
+
+    Returns:
+        dict: Extractor configuration including the feature version
+    """
+    config = dict(FEATURE_CONFIG)
+    config.update(overrides)
+    config["target_size"] = list(target_size)
+    config["version"] = FEATURE_VERSION
+    # Mode "full" tidak ditulis agar key cache yang sudah ada tetap berlaku
+    if mode != DEFAULT_FEATURE_MODE:
+        config["mode"] = mode
+        config["mode_version"] = FEATURE_MODES[mode]
+    return config
+
+
+class FeatureCache:
+    """
+    Size-bounded, content-addressed on-disk cache of feature vectors.
+
+    Args:
+        cache_dir: Directory holding the cache entries
+        max_bytes: Maximum total size of the entries on disk
+        check_every: Number of writes between two eviction passes
+    """
+
+    SUFFIX = ".npy"
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, check_every=64):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.check_every = check_every
+        self._writes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data, config):
+        """
+        Compute the cache key of an image.
+
+        Args:
+            data: Image bytes (encoded file or raw pixels)
+            config: Extractor configuration (see feature_cache_config)
+
+        Returns:
+            str: Hex digest
+        """
+        h = hashlib.sha256()
+        h.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+        h.update(b"\0")
+        h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.SUFFIX)
+
+    def get(self, key):
+        """Return the cached vector for ``key`` or None."""
+        path = self._path(key)
+        try:
+            features = np.load(path, allow_pickle=False)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+
+        # Perbarui mtime sebagai penanda "terakhir dipakai" untuk LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return features
+
+    def put(self, key, features):
+        """Store ``features`` under ``key`` (atomic replace)."""
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(features, dtype="float32"), allow_pickle=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self._writes += 1
+        if self._writes >= self.check_every:
+            self._writes = 0
+            self.evict()
+
+    def get_or_compute(self, data, config, compute):
+        """
+        Return the cached vector for (data, config), computing it on a miss.
+
+        Args:
+            data: Image bytes
+            config: Extractor configuration
+            compute: Callable without arguments returning the feature vector
+
+        Returns:
+            np.ndarray: Feature vector
+        """
+        key = self.make_key(data, config)
+        features = self.get(key)
+        if features is None:
+            features = compute()
+            if features is not None:
+                self.put(key, features)
+        return features
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size_bytes(self):
+        """Total size of the cache entries on disk."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Sudah dihapus oleh proses lain
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Remove every cache entry."""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
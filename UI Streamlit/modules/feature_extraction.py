@@ -7,65 +7,392 @@ This module contains three types of texture feature extraction:
 3. DOR Features: Directional Order Relation (25 bins)
 
 Total feature vector size: 256 + 32 + 25 = 313 dimensions
+
+Two feature modes are available:
+- "full": every extractor scans the whole image (original model)
+- "leaf": the image is cropped to the bounding box of the Otsu leaf mask
+  and the histograms only count leaf pixels, skipping the background
+
+extract_features builds one FeatureContext per image: the float32 image,
+its reflect-padded copy and the Sobel gradients are computed once and
+shared by the extractors. Intermediate arrays are written into
+FeatureBuffers, which a worker can keep and reuse for every image
+(see ``thread_buffers``).
+
+The Fine and DOR extractors have an optional Numba backend
+(``modules.feature_jit``) that counts the histograms in one pass without
+image-sized temporaries. Select it with ``set_backend("numba")`` or
+``CORNSHIELD_FEATURE_BACKEND=numba``; without Numba installed the NumPy
+path is used. Both backends give identical features.
 """
 
+import os
+import threading
+import warnings
+from contextlib import nullcontext
+from functools import cached_property, lru_cache
+
 import cv2
 import numpy as np
 
+from .segmentation import segment_otsu
+
+# Versi algoritma ekstraksi fitur. Naikkan jika hasil fitur berubah,
+# agar cache fitur lama tidak terpakai lagi.
+FEATURE_VERSION = 1
+
+# Panjang vektor fitur: Fine (256) + Coarse (32) + DOR (25)
+FEATURE_DIM = 256 + 32 + 25
+
+# Mode fitur -> versi mode. Model hanya cocok dengan fitur dari mode yang
+# sama dengan saat training (lihat modules.model_io)
+FEATURE_MODES = {"full": 1, "leaf": 1}
+DEFAULT_FEATURE_MODE = "full"
+
+# Sisi citra hasil preprocessing (piksel) yang dipakai model bawaan
+DEFAULT_FEATURE_SIZE = 256
+
+# Mode "leaf": daun lebih kecil dari ini dianggap gagal segmentasi (pakai seluruh citra)
+MIN_LEAF_PIXELS = 256
+
+# Backend ekstraktor Fine & DOR: "numpy" (bawaan) atau "numba" (opsional)
+FEATURE_BACKENDS = ("numpy", "numba")
+_backend = "numpy"
+_jit = None
+
+# Parameter ekstraktor yang dipakai extract_features (harus sama dengan training)
+FEATURE_CONFIG = {
+    "radius": 1,
+    "neighbors": 8,
+    "step": 2,
+    "num_bins": 32,
+    "window_size": 5,
+}
+
+
+@lru_cache(maxsize=None)
+def _rotation_min_lut(neighbors):
+    """
+    Lookup table mapping every LBP code to its minimum bit rotation.
+
+    Bit 0 of the sampling order is the most significant bit, matching the
+    string-joined rotations of the original per-pixel implementation.
+
+    Args:
+        neighbors: Number of neighbors (bits) per code
+
+    Returns:
+        lut: Array of size 2**neighbors (256 entries for 8 neighbors)
+    """
+    size = 1 << neighbors
+    mask = size - 1
+    codes = np.arange(size, dtype=np.int64)
+    lut = codes.copy()
+    for i in range(1, neighbors):
+        rotated = ((codes << i) | (codes >> (neighbors - i))) & mask
+        np.minimum(lut, rotated, out=lut)
+    return lut
+
+
+@lru_cache(maxsize=32)
+def _lbp_neighbor_indices(h, w, radius, neighbors, step):
+    """
+    Precompute neighbor sampling positions for the LBP sampling grid.
+
+    Positions are rounded exactly like the original ``int(round(y + r*sin))``
+    expression. Where the offset is constant along an axis it is returned as
+    a slice (view, no copy), otherwise as an index array.
+
+    Returns:
+        list of (rows, cols) tuples, one per neighbor
+    """
+    ys = np.arange(radius, h - radius, step)
+    xs = np.arange(radius, w - radius, step)
+    indices = []
+    for n in range(neighbors):
+        theta = 2 * np.pi * n / neighbors
+        yy = np.round(ys + radius * np.sin(theta)).astype(np.intp)
+        xx = np.round(xs + radius * np.cos(theta)).astype(np.intp)
+        indices.append((_as_slice(yy, ys, step), _as_slice(xx, xs, step)))
+    return indices
+
+
+def _as_slice(positions, base, step):
+    offsets = positions - base
+    if offsets.size and np.all(offsets == offsets[0]):
+        start = int(positions[0])
+        return slice(start, start + step * (len(positions) - 1) + 1, step)
+    return positions
+
+
+def set_backend(name):
+    """
+    Select the backend of extract_fine_features and extract_dor_features.
+
+    Args:
+        name: "numpy" (default) or "numba". When Numba is not installed,
+            "numba" warns and keeps the NumPy backend.
+
+    Returns:
+        The backend now in use
+    """
+    global _backend, _jit
+    if name not in FEATURE_BACKENDS:
+        raise ValueError(f"Unknown feature backend {name!r}, expected one of {FEATURE_BACKENDS}")
+
+    if name == "numba":
+        # Import numba hanya jika diminta (import-nya lambat)
+        from . import feature_jit
+        if not feature_jit.NUMBA_AVAILABLE:
+            warnings.warn("Numba is not installed, using the NumPy feature backend")
+            name = "numpy"
+        else:
+            _jit = feature_jit
+    if name == "numpy":
+        _jit = None
+    _backend = name
+    return _backend
+
+
+def get_backend():
+    """Backend currently used by the Fine and DOR extractors."""
+    return _backend
+
+
+@lru_cache(maxsize=32)
+def _lbp_index_tables(h, w, radius, neighbors, step):
+    """Center and neighbor positions of the LBP grid as int arrays (Numba backend)."""
+    ys = np.arange(radius, h - radius, step)
+    xs = np.arange(radius, w - radius, step)
+    nb_rows = np.empty((neighbors, len(ys)), dtype=np.intp)
+    nb_cols = np.empty((neighbors, len(xs)), dtype=np.intp)
+    for n, (rows, cols) in enumerate(_lbp_neighbor_indices(h, w, radius, neighbors, step)):
+        nb_rows[n] = np.arange(h)[rows]
+        nb_cols[n] = np.arange(w)[cols]
+    return ys.astype(np.intp), xs.astype(np.intp), nb_rows, nb_cols
+
+
+@lru_cache(maxsize=32)
+def _reflect_index(n, pad):
+    """Source index of every position of a reflect-padded axis (np.pad semantics)."""
+    return np.pad(np.arange(n, dtype=np.intp), pad, mode="reflect")
+
+
+# np.bincount mengubah input ke int64; hitung per blok agar salinannya kecil
+_COUNT_BLOCK = 1 << 16
+
+
+def _bincount_blocks(values, minlength):
+    """np.bincount of a small-integer array, converted block by block."""
+    values = values.ravel()
+    if values.size <= _COUNT_BLOCK:
+        return np.bincount(values, minlength=minlength)
+    counts = np.zeros(minlength, dtype=np.int64)
+    for start in range(0, values.size, _COUNT_BLOCK):
+        block = np.bincount(values[start:start + _COUNT_BLOCK], minlength=minlength)
+        if block.size > counts.size:
+            block[:counts.size] += counts
+            counts = block
+        else:
+            counts[:block.size] += block
+    return counts
+
+
+class FeatureBuffers:
+    """
+    Scratch arrays reused between images.
+
+    Each named array grows to the largest shape requested so far, so one
+    instance serves images of different sizes (e.g. leaf crops). Arrays
+    returned for one image are overwritten by the next; an instance must
+    not be shared between threads (see ``thread_buffers``).
+    """
+
+    def __init__(self):
+        self._arrays = {}
+
+    def get(self, name, shape, dtype):
+        """Uninitialized array of the given shape and dtype, backed by a reused buffer."""
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buf = self._arrays.get(name)
+        if buf is None or buf.dtype != dtype or buf.size < size:
+            buf = np.empty(size, dtype=dtype)
+            self._arrays[name] = buf
+        return buf[:size].reshape(shape)
+
+    def nbytes(self):
+        """Total size of the buffers held."""
+        return sum(buf.nbytes for buf in self._arrays.values())
+
+
+_thread_local = threading.local()
+
+
+def thread_buffers():
+    """FeatureBuffers of the calling thread (created on first use)."""
+    buffers = getattr(_thread_local, "buffers", None)
+    if buffers is None:
+        buffers = _thread_local.buffers = FeatureBuffers()
+    return buffers
+
 
-def extract_fine_features(gray, radius=1, neighbors=8, step=2):
+class FeatureContext:
+    """
+    Per-image intermediates shared by the extractors.
+
+    The reflect-padded image and the Sobel gradient magnitude are computed
+    on first access and written into ``buffers``. Both work directly on the
+    uint8 image: absolute differences of uint8 pixels are exact in uint8,
+    and Sobel of uint8 input into CV_32F equals Sobel of its float32 copy,
+    so no float32 copy of the image is made.
+
+    Args:
+        gray: Grayscale image (uint8)
+        buffers: FeatureBuffers to write into (default: fresh arrays)
+    """
+
+    def __init__(self, gray, buffers=None):
+        self.gray = gray
+        self.buffers = buffers if buffers is not None else FeatureBuffers()
+        self._padded = {}
+
+    def padded(self, pad):
+        """uint8 image padded by ``pad`` pixels (np.pad ``reflect`` mode)."""
+        padded = self._padded.get(pad)
+        if padded is None:
+            h, w = self.gray.shape
+            if pad < min(h, w):
+                out = self.buffers.get(f"padded_{pad}", (h + 2 * pad, w + 2 * pad), np.uint8)
+                padded = cv2.copyMakeBorder(self.gray, pad, pad, pad, pad,
+                                            cv2.BORDER_REFLECT_101, dst=out)
+            else:
+                # Citra sangat kecil: refleksi berulang hanya didukung np.pad
+                padded = np.pad(self.gray, pad, mode="reflect")
+            self._padded[pad] = padded
+        return padded
+
+    @cached_property
+    def magnitude(self):
+        """Sobel gradient magnitude sqrt(dx^2 + dy^2), float32 (ksize=3)."""
+        shape = self.gray.shape
+        sobelx = cv2.Sobel(self.gray, cv2.CV_32F, 1, 0, ksize=3,
+                           dst=self.buffers.get("sobelx", shape, np.float32))
+        sobely = cv2.Sobel(self.gray, cv2.CV_32F, 0, 1, ksize=3,
+                           dst=self.buffers.get("sobely", shape, np.float32))
+        np.multiply(sobelx, sobelx, out=sobelx)
+        np.multiply(sobely, sobely, out=sobely)
+        np.add(sobelx, sobely, out=sobelx)
+        return np.sqrt(sobelx, out=sobelx)
+
+
+def extract_fine_features(gray, radius=1, neighbors=8, step=2, mask=None, context=None):
     """
     Extract Fine texture features using LBP-like rotation invariant method.
 
+    The codes are computed for the whole sampling grid at once by comparing
+    shifted views of the image against the centers, then mapped through a
+    rotation-minimum lookup table. The histogram is identical to the
+    original per-pixel loop.
+
     Args:
         gray: Grayscale image (uint8)
         radius: Radius for neighbor sampling (default: 1)
         neighbors: Number of neighbors to sample (default: 8)
         step: Step size for pixel sampling (default: 2)
+        mask: Optional boolean mask (same shape as gray); only sampled
+            centers inside the mask are counted
+        context: Optional FeatureContext of gray; its buffers hold the codes
 
     Returns:
         hist: Normalized histogram of LBP codes (256 bins)
     """
     h, w = gray.shape
-    codes = []
-
-    for y in range(radius, h - radius, step):
-        for x in range(radius, w - radius, step):
-            center = gray[y, x]
-            binary = []
-            for n in range(neighbors):
-                theta = 2 * np.pi * n / neighbors
-                yy = int(round(y + radius * np.sin(theta)))
-                xx = int(round(x + radius * np.cos(theta)))
-                binary.append(1 if gray[yy, xx] >= center else 0)
-
-            # Rotation invariant: take minimum rotation
-            rotations = [
-                int("".join(map(str, binary[i:] + binary[:i])), 2)
-                for i in range(neighbors)
-            ]
-            codes.append(min(rotations))
-
-    hist, _ = np.histogram(codes, bins=256, range=(0, 256))
+    center = gray[radius:max(h - radius, radius):step, radius:max(w - radius, radius):step]
+
+    if center.size == 0:
+        return np.zeros(256, dtype="float32")
+
+    if _jit is not None:
+        counts = _jit.lbp_counts(gray, *_lbp_index_tables(h, w, radius, neighbors, step),
+                                 _rotation_min_lut(neighbors), mask)
+        hist = counts.astype("float32")
+        hist /= (hist.sum() + 1e-8)
+        return hist
+
+    if neighbors <= 8:
+        codes = _lbp_codes_uint8(gray, center, radius, neighbors, step,
+                                 (context or FeatureContext(gray)).buffers)
+    else:
+        codes = np.zeros(center.shape, dtype=np.int64)
+        for n, (rows, cols) in enumerate(_lbp_neighbor_indices(h, w, radius, neighbors, step)):
+            if isinstance(rows, slice) or isinstance(cols, slice):
+                neighbor = gray[rows, cols]
+            else:
+                neighbor = gray[np.ix_(rows, cols)]
+            codes |= (neighbor >= center).astype(np.int64) << (neighbors - 1 - n)
+
+        # Rotation invariant: take minimum rotation
+        codes = _rotation_min_lut(neighbors)[codes]
+
+    if mask is not None:
+        codes = codes[mask[radius:max(h - radius, radius):step, radius:max(w - radius, radius):step]]
+
+    counts = _bincount_blocks(codes, 256)
+    hist = counts[:256].copy()
+    # np.histogram(range=(0, 256)) menghitung nilai 256 ke bin terakhir
+    if counts.size > 256:
+        hist[255] += counts[256]
     hist = hist.astype("float32")
     hist /= (hist.sum() + 1e-8)
     return hist
 
 
-def extract_coarse_features(gray, num_bins=32):
+def _lbp_codes_uint8(gray, center, radius, neighbors, step, buffers):
+    """Rotation-minimum LBP codes (uint8) of every sampled center, written into buffers."""
+    h, w = gray.shape
+    codes = buffers.get("lbp_codes", center.shape, np.uint8)
+    bit = buffers.get("lbp_bit", center.shape, np.uint8)
+    ge = buffers.get("lbp_ge", center.shape, bool)
+    codes.fill(0)
+    for n, (rows, cols) in enumerate(_lbp_neighbor_indices(h, w, radius, neighbors, step)):
+        if isinstance(rows, slice) or isinstance(cols, slice):
+            neighbor = gray[rows, cols]
+        else:
+            neighbor = gray[np.ix_(rows, cols)]
+        np.greater_equal(neighbor, center, out=ge)
+        np.left_shift(ge.view(np.uint8), neighbors - 1 - n, out=bit)
+        np.bitwise_or(codes, bit, out=codes)
+
+    # Rotation invariant: take minimum rotation (in place)
+    return np.take(_rotation_min_lut_uint8(neighbors), codes, out=codes, mode="clip")
+
+
+@lru_cache(maxsize=None)
+def _rotation_min_lut_uint8(neighbors):
+    return _rotation_min_lut(neighbors).astype(np.uint8)
+
+
+def extract_coarse_features(gray, num_bins=32, mask=None, context=None):
     """
     Extract Coarse texture features using gradient magnitude histogram.
 
     Args:
         gray: Grayscale image (uint8)
         num_bins: Number of histogram bins (default: 32)
+        mask: Optional boolean mask (same shape as gray); only gradients of
+            pixels inside the mask are counted (the bin range follows their maximum)
+        context: Optional FeatureContext of gray sharing the gradients
 
     Returns:
         hist: Normalized histogram of gradient magnitudes
     """
-    sobelx = cv2.Sobel(gray.astype("float32"), cv2.CV_32F, 1, 0, ksize=3)
-    sobely = cv2.Sobel(gray.astype("float32"), cv2.CV_32F, 0, 1, ksize=3)
-    magnitude = np.sqrt(sobelx**2 + sobely**2)
+    magnitude = (context or FeatureContext(gray)).magnitude
+
+    if mask is not None:
+        magnitude = magnitude[mask]
+        if magnitude.size == 0:
+            return np.zeros(num_bins, dtype="float32")
 
     hist, _ = np.histogram(magnitude, bins=num_bins, range=(0, magnitude.max() + 1e-8))
     hist = hist.astype("float32")
@@ -73,13 +400,24 @@ def extract_coarse_features(gray, num_bins=32):
     return hist
 
 
-def extract_dor_features(gray, window_size=5):
+def extract_dor_features(gray, window_size=5, row_chunk=None, mask=None, context=None):
     """
     Extract DOR (Directional Order Relation) features.
 
+    The dominant-offset index of every pixel is computed at once from the
+    window_size^2 shifted planes of the padded image. Ties keep the first
+    offset in row-major order, exactly like ``np.argmax`` on the flattened
+    window.
+
     Args:
         gray: Grayscale image (uint8)
         window_size: Size of the window for DOR computation (must be odd, default: 5)
+        row_chunk: Number of image rows processed per pass. None processes the
+            whole image at once; smaller values cap peak memory for large images.
+            (NumPy backend only; the Numba backend needs no temporaries.)
+        mask: Optional boolean mask (same shape as gray); only pixels inside
+            the mask are counted
+        context: Optional FeatureContext of gray sharing the padded image
 
     Returns:
         hist: Normalized histogram of dominant indices (window_size^2 bins)
@@ -87,38 +425,152 @@ def extract_dor_features(gray, window_size=5):
     assert window_size % 2 == 1, "window_size harus ganjil"
 
     pad = window_size // 2
-    padded = np.pad(gray.astype("float32"), pad, mode="reflect")
     h, w = gray.shape
-    dom_idx = []
+    num_pos = window_size * window_size
 
-    for y in range(h):
-        for x in range(w):
-            region = padded[y:y+window_size, x:x+window_size]
-            center = padded[y+pad, x+pad]
+    if _jit is not None:
+        counts = _jit.dor_counts(gray, _reflect_index(h, pad), _reflect_index(w, pad), window_size, mask)
+        hist = counts.astype("float32")
+        hist /= (hist.sum() + 1e-8)
+        return hist
 
-            diffs = np.abs(region - center).flatten()
-            dom_idx.append(np.argmax(diffs))
+    context = context or FeatureContext(gray)
+    padded = context.padded(pad)
 
-    num_pos = window_size * window_size
-    hist, _ = np.histogram(dom_idx, bins=num_pos, range=(0, num_pos))
-    hist = hist.astype("float32")
+    if row_chunk is None or row_chunk <= 0:
+        row_chunk = h
+
+    counts = np.zeros(num_pos, dtype=np.int64)
+    for y0 in range(0, h, row_chunk):
+        y1 = min(y0 + row_chunk, h)
+        dom_idx = _dor_dominant_indices(padded, y0, y1, w, window_size, context.buffers)
+        if mask is not None:
+            dom_idx = dom_idx[mask[y0:y1]]
+        counts += _bincount_blocks(dom_idx, num_pos)
+
+    hist = counts.astype("float32")
     hist /= (hist.sum() + 1e-8)
     return hist
 
 
-def extract_features(gray):
+def _dor_dominant_indices(padded, y0, y1, w, window_size, buffers=None):
+    """Dominant-offset index for image rows [y0, y1) of the padded image."""
+    pad = window_size // 2
+    rows = y1 - y0
+    center = padded[y0 + pad:y1 + pad, pad:pad + w]
+    buffers = buffers if buffers is not None else FeatureBuffers()
+
+    best = buffers.get("dor_best", (rows, w), padded.dtype)
+    dom_idx = buffers.get("dor_idx", (rows, w), np.uint8 if window_size ** 2 <= 256 else np.uint16)
+    diff = buffers.get("dor_diff", (rows, w), padded.dtype)
+    greater = buffers.get("dor_greater", (rows, w), bool)
+    best.fill(0)
+    dom_idx.fill(0)
+
+    for k in range(window_size * window_size):
+        dy, dx = divmod(k, window_size)
+        plane = padded[y0 + dy:y1 + dy, dx:dx + w]
+        cv2.absdiff(plane, center, dst=diff)
+        # Strictly greater: offset pertama yang menang saat seri (sama dengan argmax)
+        np.greater(diff, best, out=greater)
+        np.copyto(dom_idx, k, where=greater)
+        np.maximum(best, diff, out=best)
+
+    return dom_idx
+
+
+def _untimed(stage):
+    return nullcontext()
+
+
+def leaf_mask(segmentation):
+    """
+    Boolean leaf mask of an Otsu segmentation.
+
+    Otsu only separates bright from dark pixels. The class that covers most
+    of the image border is taken as background (white or dark), the other
+    one as the leaf.
+
+    Args:
+        segmentation: Binary mask from segment_otsu (0 / 255)
+
+    Returns:
+        np.ndarray of bool
+    """
+    border = np.concatenate([
+        segmentation[0], segmentation[-1], segmentation[1:-1, 0], segmentation[1:-1, -1],
+    ])
+    background_is_bright = np.count_nonzero(border) * 2 >= border.size
+    return segmentation == 0 if background_is_bright else segmentation > 0
+
+
+def leaf_crop(mask, margin, align=1):
+    """
+    Bounding box of the leaf pixels, widened by ``margin`` on every side.
+
+    The top-left corner is rounded down to a multiple of ``align`` so the
+    LBP sampling grid of the crop coincides with the grid of the full image.
+
+    Returns:
+        tuple of slices (rows, cols), or None if the mask has fewer than
+        MIN_LEAF_PIXELS leaf pixels
+    """
+    if np.count_nonzero(mask) < MIN_LEAF_PIXELS:
+        return None
+    x, y, w, h = cv2.boundingRect(mask.view(np.uint8))
+    y0 = max(y - margin, 0) // align * align
+    x0 = max(x - margin, 0) // align * align
+    return (slice(y0, min(y + h + margin, mask.shape[0])),
+            slice(x0, min(x + w + margin, mask.shape[1])))
+
+
+def extract_features(gray, timer=None, mode=DEFAULT_FEATURE_MODE, segmentation=None, buffers=None):
     """
     Extract all features (Fine + Coarse + DOR) and concatenate them.
 
     Args:
         gray: Grayscale image (uint8)
+        timer: Optional callable ``timer(stage)`` returning a context manager
+            wrapped around each extractor (e.g. ``metrics.stage``)
+        mode: Feature mode, "full" (whole image) or "leaf" (Otsu leaf pixels only)
+        segmentation: Otsu mask of gray for the "leaf" mode (computed if None)
+        buffers: Optional FeatureBuffers reused between calls (e.g. thread_buffers())
 
     Returns:
         features: Feature vector of 313 dimensions (256 + 32 + 25)
     """
-    fine = extract_fine_features(gray)
-    coarse = extract_coarse_features(gray)
-    dor = extract_dor_features(gray)
+    if mode not in FEATURE_MODES:
+        raise ValueError(f"Unknown feature mode {mode!r}, expected one of {tuple(FEATURE_MODES)}")
+
+    cfg = FEATURE_CONFIG
+    timer = timer or _untimed
+    mask = None
+
+    if mode == "leaf":
+        with timer("leaf_mask"):
+            if segmentation is None:
+                segmentation = segment_otsu(gray)
+            mask = leaf_mask(segmentation)
+            # Margin = jangkauan tetangga terbesar, agar piksel daun di tepi crop
+            # melihat tetangga yang sama seperti pada citra penuh
+            margin = max(cfg["radius"], cfg["window_size"] // 2)
+            crop = leaf_crop(mask, margin, align=cfg["step"])
+            if crop is None:
+                mask = None
+            else:
+                gray, mask = gray[crop], mask[crop]
+
+    context = FeatureContext(gray, buffers)
+    with timer("extract_fine"):
+        fine = extract_fine_features(gray, cfg["radius"], cfg["neighbors"], cfg["step"], mask, context)
+    with timer("extract_coarse"):
+        coarse = extract_coarse_features(gray, cfg["num_bins"], mask, context)
+    with timer("extract_dor"):
+        dor = extract_dor_features(gray, cfg["window_size"], mask=mask, context=context)
 
     # Total fitur = 256 + 32 + 25 = 313 dimensi
     return np.concatenate([fine, coarse, dor]).astype("float32")
+
+
+if os.environ.get("CORNSHIELD_FEATURE_BACKEND", "numpy") != "numpy":
+    set_backend(os.environ["CORNSHIELD_FEATURE_BACKEND"])
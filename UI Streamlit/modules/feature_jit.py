@@ -0,0 +1,142 @@
+"""
+Optional Numba backend for the Fine (LBP) and DOR texture extractors.
+
+Each kernel walks the image once, row by row, and counts the histogram
+directly with row-sized scratch arrays only. Rows are split into one
+block per thread (``prange``), each counting into its own histogram.
+Neighbor positions and reflect padding come from index tables built with
+the same NumPy expressions as the NumPy path, so both backends produce
+identical histograms.
+
+Numba is not a required dependency. Without it ``NUMBA_AVAILABLE`` is
+False and ``modules.feature_extraction`` keeps using the NumPy path; the
+backend is selected with ``feature_extraction.set_backend``.
+"""
+
+import numpy as np
+
+try:
+    from numba import get_num_threads, njit, prange
+except ImportError:
+    njit = None
+
+NUMBA_AVAILABLE = njit is not None
+
+
+def _blocks(n_rows):
+    n_blocks = max(1, min(get_num_threads(), n_rows))
+    return n_blocks, (n_rows + n_blocks - 1) // n_blocks
+
+
+if NUMBA_AVAILABLE:
+
+    @njit(parallel=True, cache=True)
+    def _lbp_counts(gray, center_rows, center_cols, nb_rows, nb_cols, lut, mask,
+                    use_mask, n_blocks, block):
+        neighbors = nb_rows.shape[0]
+        n_rows = center_rows.shape[0]
+        n_cols = center_cols.shape[0]
+        counts = np.zeros((n_blocks, 256), dtype=np.int64)
+        for b in prange(n_blocks):
+            # Buffer sepanjang satu baris grid (bukan sebesar citra)
+            center = np.empty(n_cols, dtype=np.uint8)
+            code = np.empty(n_cols, dtype=np.int64)
+            for i in range(b * block, min((b + 1) * block, n_rows)):
+                cy = center_rows[i]
+                for j in range(n_cols):
+                    center[j] = gray[cy, center_cols[j]]
+                    code[j] = 0
+                for n in range(neighbors):
+                    row = nb_rows[n, i]
+                    bit = 1 << (neighbors - 1 - n)
+                    for j in range(n_cols):
+                        if gray[row, nb_cols[n, j]] >= center[j]:
+                            code[j] |= bit
+                for j in range(n_cols):
+                    if use_mask and not mask[cy, center_cols[j]]:
+                        continue
+                    v = lut[code[j]]
+                    # np.histogram(range=(0, 256)): nilai 256 masuk bin terakhir
+                    if v < 256:
+                        counts[b, v] += 1
+                    elif v == 256:
+                        counts[b, 255] += 1
+        return counts.sum(axis=0)
+
+    @njit(parallel=True, cache=True)
+    def _dor_counts(gray, ry, rx, window_size, mask, use_mask, n_blocks, block):
+        h, w = gray.shape
+        pad = window_size // 2
+        num_pos = window_size * window_size
+        counts = np.zeros((n_blocks, num_pos), dtype=np.int64)
+        for b in prange(n_blocks):
+            # Buffer sepanjang satu baris (bukan sebesar citra)
+            line = np.empty(w + 2 * pad, dtype=np.int32)
+            center = np.empty(w, dtype=np.int32)
+            best = np.empty(w, dtype=np.int32)
+            idx = np.empty(w, dtype=np.int32)
+            for y in range(b * block, min((b + 1) * block, h)):
+                for x in range(w):
+                    center[x] = gray[y, x]
+                    best[x] = 0
+                    idx[x] = 0
+                for dy in range(window_size):
+                    src = ry[y + dy]
+                    for x in range(w + 2 * pad):
+                        line[x] = gray[src, rx[x]]
+                    for dx in range(window_size):
+                        k = dy * window_size + dx
+                        for x in range(w):
+                            d = abs(line[x + dx] - center[x])
+                            # Strictly greater: offset pertama yang menang saat seri (sama dengan argmax)
+                            if d > best[x]:
+                                best[x] = d
+                                idx[x] = k
+                for x in range(w):
+                    if use_mask and not mask[y, x]:
+                        continue
+                    counts[b, idx[x]] += 1
+        return counts.sum(axis=0)
+
+
+_NO_MASK = np.ones((1, 1), dtype=bool)
+
+
+def lbp_counts(gray, center_rows, center_cols, nb_rows, nb_cols, lut, mask=None):
+    """
+    Histogram counts (256 bins) of rotation-invariant LBP codes.
+
+    Args:
+        gray: Grayscale image (uint8)
+        center_rows, center_cols: Sampled center positions (1-D int arrays)
+        nb_rows, nb_cols: Neighbor positions, shape (neighbors, len(center_rows))
+            and (neighbors, len(center_cols))
+        lut: Rotation-minimum lookup table (2**neighbors entries)
+        mask: Optional boolean mask (same shape as gray) checked at the centers
+
+    Returns:
+        np.ndarray of int64 counts
+    """
+    n_blocks, block = _blocks(len(center_rows))
+    use_mask = mask is not None
+    return _lbp_counts(gray, center_rows, center_cols, nb_rows, nb_cols,
+                       lut, mask if use_mask else _NO_MASK, use_mask, n_blocks, block)
+
+
+def dor_counts(gray, ry, rx, window_size, mask=None):
+    """
+    Histogram counts (window_size^2 bins) of dominant DOR offsets.
+
+    Args:
+        gray: Grayscale image (uint8)
+        ry, rx: Reflect-padding index tables (``np.pad(np.arange(n), pad, "reflect")``)
+        window_size: Odd window size
+        mask: Optional boolean mask (same shape as gray)
+
+    Returns:
+        np.ndarray of int64 counts
+    """
+    n_blocks, block = _blocks(gray.shape[0])
+    use_mask = mask is not None
+    return _dor_counts(gray, ry, rx, window_size,
+                       mask if use_mask else _NO_MASK, use_mask, n_blocks, block)
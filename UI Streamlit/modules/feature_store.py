@@ -0,0 +1,264 @@
+"""
+Append-only, memory-mapped feature store for training data.
+
+Layout of a store directory:
+- ``features.f32``: raw float32 matrix, one row of ``dim`` values per image
+- ``index.csv``: path, label, file size and mtime (ns) of every row, in row order
+- ``meta.json``: feature dimension and extractor configuration
+
+The matrix is opened with ``np.memmap`` so training code can slice rows
+without loading the whole dataset into memory. New images are extracted
+and appended; rows whose file is unchanged (same size and mtime) are
+never recomputed. ``sync`` drops the rows of files that were deleted,
+changed in place or left out of the dataset and re-extracts the changed
+ones; dropping rows compacts the matrix through a small journal, so an
+interrupted compaction is finished the next time the store is opened.
+A store is meant to have a single writer at a time.
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+
+from .dataset import extract_dataset_features, image_path_to_vector
+
+# Baris per blok saat memadatkan matriks fitur
+_COMPACT_ROWS = 4096
+
+
+def file_stamp(path):
+    """(size, mtime_ns) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class FeatureStore:
+    """
+    On-disk float32 feature matrix with a path/label index.
+
+    Args:
+        root: Store directory (created if missing)
+        dim: Feature vector length (default: 313)
+        config: Extractor configuration saved with the store. Opening an
+            existing store with a different configuration raises ValueError.
+    """
+
+    FEATURES_FILE = "features.f32"
+    INDEX_FILE = "index.csv"
+    META_FILE = "meta.json"
+    COMPACT_MARKER = "compact.pending"
+
+    def __init__(self, root, dim=313, config=None):
+        self.root = root
+        self.dim = dim
+        self.config = config or {}
+        os.makedirs(root, exist_ok=True)
+
+        self._features_path = os.path.join(root, self.FEATURES_FILE)
+        self._index_path = os.path.join(root, self.INDEX_FILE)
+        self._meta_path = os.path.join(root, self.META_FILE)
+        self._marker_path = os.path.join(root, self.COMPACT_MARKER)
+
+        self._check_meta()
+        self._finish_compaction()
+        self.paths, self.labels, self.stamps = self._read_index()
+        self._repair()
+        self.removed = 0
+
+    def _check_meta(self):
+        meta = {"dim": self.dim, "dtype": "float32", "config": self.config}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                stored = json.load(f)
+            if stored != json.loads(json.dumps(meta)):
+                raise ValueError(
+                    f"Feature store at {self.root} was built with a different "
+                    f"configuration: {stored}"
+                )
+        else:
+            with open(self._meta_path, "w") as f:
+                json.dump(meta, f, indent=2, sort_keys=True)
+
+    def _read_index(self):
+        paths, labels, stamps = [], [], []
+        if os.path.exists(self._index_path):
+            with open(self._index_path, newline="") as f:
+                for row in csv.reader(f):
+                    paths.append(row[0])
+                    labels.append(row[1])
+                    # Index lama (path, label) belum punya stamp
+                    stamps.append((int(row[2]), int(row[3])) if len(row) >= 4 and row[2] else None)
+        return paths, labels, stamps
+
+    def _index_rows(self, paths, labels, stamps):
+        return [(p, l) + (stamp or ("", "")) for p, l, stamp in zip(paths, labels, stamps)]
+
+    def _repair(self):
+        # Samakan jumlah baris fitur dan index jika penulisan sebelumnya terputus
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._features_path) if os.path.exists(self._features_path) else 0
+        n_valid = min(len(self.paths), size // row_bytes)
+
+        if len(self.paths) > n_valid:
+            self.paths = self.paths[:n_valid]
+            self.labels = self.labels[:n_valid]
+            self.stamps = self.stamps[:n_valid]
+            self._rewrite_index()
+        if size > n_valid * row_bytes:
+            with open(self._features_path, "r+b") as f:
+                f.truncate(n_valid * row_bytes)
+
+    def _rewrite_index(self, path=None):
+        with open(path or self._index_path, "w", newline="") as f:
+            csv.writer(f).writerows(self._index_rows(self.paths, self.labels, self.stamps))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _finish_compaction(self):
+        # Marker ada: kedua file .tmp sudah lengkap, selesaikan penggantiannya.
+        # Tanpa marker, file .tmp adalah sisa pemadatan yang terputus sebelum selesai
+        pending = os.path.exists(self._marker_path)
+        for path in (self._features_path, self._index_path):
+            if os.path.exists(path + ".tmp"):
+                if pending:
+                    os.replace(path + ".tmp", path)
+                else:
+                    os.remove(path + ".tmp")
+        if pending:
+            os.remove(self._marker_path)
+
+    def drop(self, rows):
+        """
+        Remove rows from the store (the matrix is compacted on disk).
+
+        Args:
+            rows: Row indices to remove
+        """
+        drop = set(int(i) for i in rows)
+        if not drop:
+            return
+        keep = np.array([i for i in range(len(self)) if i not in drop], dtype=np.intp)
+
+        old = self.features()
+        with open(self._features_path + ".tmp", "wb") as f:
+            for start in range(0, len(keep), _COMPACT_ROWS):
+                f.write(np.ascontiguousarray(old[keep[start:start + _COMPACT_ROWS]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        del old
+
+        self.paths = [self.paths[i] for i in keep]
+        self.labels = [self.labels[i] for i in keep]
+        self.stamps = [self.stamps[i] for i in keep]
+        self._rewrite_index(self._index_path + ".tmp")
+
+        with open(self._marker_path, "w"):
+            pass
+        self._finish_compaction()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def features(self):
+        """
+        Read-only memory map of the feature matrix.
+
+        Returns:
+            np.memmap of shape (n_rows, dim), dtype float32
+        """
+        if len(self) == 0:
+            return np.empty((0, self.dim), dtype="float32")
+        return np.memmap(self._features_path, dtype="float32", mode="r",
+                         shape=(len(self), self.dim))
+
+    def label_array(self):
+        """Labels of every row as a NumPy array."""
+        return np.asarray(self.labels)
+
+    def append(self, vectors, paths, labels, stamps=None):
+        """
+        Append feature rows and their index entries.
+
+        Args:
+            vectors: Array-like of shape (n, dim)
+            paths: n image paths
+            labels: n labels
+            stamps: n (size, mtime_ns) of the files as they were extracted
+                (default: their current stamp, see file_stamp)
+        """
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if vectors.size == 0:
+            return
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim}), got {vectors.shape}")
+        if not len(vectors) == len(paths) == len(labels):
+            raise ValueError("vectors, paths and labels must have the same length")
+        stamps = list(stamps) if stamps is not None else [file_stamp(p) for p in paths]
+
+        # Fitur ditulis dulu, lalu index; index adalah sumber kebenaran jumlah baris
+        with open(self._features_path, "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(self._index_path, "a", newline="") as f:
+            csv.writer(f).writerows(self._index_rows(paths, labels, stamps))
+
+        self.paths.extend(paths)
+        self.labels.extend(labels)
+        self.stamps.extend(stamps)
+
+    def sync(self, paths, labels, vectorize=image_path_to_vector, **extract_kwargs):
+        """
+        Bring the store up to date with the dataset files.
+
+        Rows whose path is not in ``paths``, whose file no longer exists, or
+        whose size or mtime changed are dropped first (``removed``), so the
+        store holds exactly the given dataset; then every image that has no row
+        is extracted and appended, including the changed ones. Rows from
+        an index without stamps (older stores) adopt the current stamp of
+        their file.
+
+        Args:
+            paths: Image paths of the dataset
+            labels: Label of every path
+            vectorize: Callable ``path -> feature vector or None``
+            **extract_kwargs: Passed to extract_dataset_features (n_jobs, chunksize, ...)
+
+        Returns:
+            tuple: (n_added, failed_paths); the number of dropped rows is
+            kept in ``self.removed``
+        """
+        # Stamp diambil sebelum ekstraksi: file yang berubah selama ekstraksi
+        # terdeteksi pada sync berikutnya
+        current = {p: file_stamp(p) for p in set(paths)}
+
+        stale = []
+        for i, (path, stamp) in enumerate(zip(self.paths, self.stamps)):
+            # Path di luar dataset (mis. dataset dipersempit) juga dibuang
+            if current.get(path) is None or (stamp is not None and stamp != current[path]):
+                stale.append(i)
+        self.removed = len(stale)
+        self.drop(stale)
+
+        if any(stamp is None for stamp in self.stamps):
+            self.stamps = [stamp or current[p] for p, stamp in zip(self.paths, self.stamps)]
+            self._rewrite_index()
+
+        known = set(self.paths)
+        new = [(p, l) for p, l in zip(paths, labels) if p not in known]
+        if not new:
+            return 0, []
+
+        new_paths = [p for p, _ in new]
+        new_labels = [l for _, l in new]
+        X_new, kept, failed = extract_dataset_features(new_paths, vectorize, **extract_kwargs)
+
+        self.append(X_new, [new_paths[i] for i in kept], [new_labels[i] for i in kept],
+                    [current[new_paths[i]] for i in kept])
+        return len(kept), failed
@@ -0,0 +1,212 @@
+"""
+Integral-histogram feature engine for many windows of one image.
+
+Sliding-window and tiled analysis with ``extract_features`` recomputes the
+LBP codes, Sobel gradients and DOR indices of every overlapping window.
+IntegralFeatures computes the per-pixel maps once per image (LBP code of
+every sampled center, gradient bin and magnitude of every pixel, DOR
+dominant index of every pixel) and turns each map into an integral
+histogram, so the 313-dim vector of any window is read with four lookups
+per histogram instead of being extracted again.
+
+The integral histograms are kept at the granularity of CELL_SIZE x
+CELL_SIZE cells (one histogram per cell corner instead of per pixel, which
+would need gigabytes for a 4K frame), so window borders must lie on the
+cell grid or on the image border (see ``tiling.tile_origins(align=...)``).
+
+The whole image is the special case of ``extract_features``: its vector is
+identical. A smaller window differs from ``extract_features`` on its crop
+only along the border, where the maps see the real neighbouring pixels
+instead of the reflect padding of the crop.
+
+The Coarse histogram spans [0, max magnitude of the window]. A window that
+holds the image maximum reads it from the integral histogram; for the
+others it is binned from the cached magnitude map (no Sobel is repeated).
+``coarse_range="image"`` reads every window from the integral histogram
+with the image-wide range instead (constant time, but not the range used
+in training).
+"""
+
+import numpy as np
+
+from .feature_extraction import (
+    FEATURE_CONFIG, FEATURE_DIM, FeatureContext, _dor_dominant_indices, _lbp_codes_uint8,
+)
+
+# Sisi sel integral histogram (piksel); batas jendela harus kelipatannya
+CELL_SIZE = 16
+
+COARSE_RANGES = ("region", "image")
+
+
+def window_sums(integral, y0, y1, x0, x1):
+    """
+    Sums of the windows [y0, y1) x [x0, x1) from an integral image.
+
+    With 1-D index arrays of equal length the result has one entry per
+    window; extra trailing axes of ``integral`` (histogram bins) are kept.
+    """
+    return integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+
+
+def _integral_histogram(values, rows, cols, grid, bins):
+    """
+    Integral histogram over the cell grid.
+
+    Args:
+        values: 2-D array of bin indices
+        rows, cols: Pixel position of every row / column of ``values``
+        grid: (cell_rows, cell_cols) of the image
+        bins: Number of bins
+
+    Returns:
+        int32 array of shape (cell_rows + 1, cell_cols + 1, bins)
+    """
+    n_rows, n_cols = grid
+    cell_rows = rows // CELL_SIZE
+    offsets = (cols // CELL_SIZE * bins)[None, :]
+    counts = np.zeros((n_rows + 1, n_cols + 1, bins), dtype=np.int32)
+    # Per baris sel, agar indeks gabungan tidak sebesar seluruh citra
+    for cy in range(n_rows):
+        strip = values[cell_rows == cy]
+        if strip.size:
+            counts[cy + 1, 1:] = np.bincount((offsets + strip).ravel(),
+                                             minlength=n_cols * bins).reshape(n_cols, bins)
+    np.cumsum(counts, axis=0, out=counts)
+    np.cumsum(counts, axis=1, out=counts)
+    return counts
+
+
+def _bin_indices(values, edges):
+    """Bin of every value for the uniform ``edges`` of np.histogram (first edge 0), same rounding."""
+    n = len(edges) - 1
+    values = values.astype(edges.dtype, copy=False)
+    idx = (values * (n / edges[-1])).astype(np.intp)
+    np.minimum(idx, n - 1, out=idx)
+    # Koreksi pembulatan di sekitar tepi bin, seperti np.histogram
+    idx -= values < edges[idx]
+    idx += (values >= edges[idx + 1]) & (idx != n - 1)
+    return idx
+
+
+def _normalize(counts):
+    # Sama persis dengan normalisasi di extractor (float32)
+    hist = counts.astype("float32")
+    hist /= (hist.sum(axis=-1, keepdims=True) + 1e-8)
+    return hist
+
+
+class IntegralFeatures:
+    """
+    Per-image maps and integral histograms of the Fine, Coarse and DOR features.
+
+    Args:
+        gray: Grayscale image (uint8)
+        coarse_range: "region" (bin range of every window follows its own
+            maximum, as in ``extract_features``) or "image" (image-wide range,
+            constant time for every window)
+    """
+
+    def __init__(self, gray, coarse_range="region"):
+        if coarse_range not in COARSE_RANGES:
+            raise ValueError(f"Unknown coarse_range {coarse_range!r}, expected one of {COARSE_RANGES}")
+
+        cfg = FEATURE_CONFIG
+        radius, step = cfg["radius"], cfg["step"]
+        h, w = gray.shape
+        self.shape = (h, w)
+        self.coarse_range = coarse_range
+        self.num_bins = cfg["num_bins"]
+        grid = (-(-h // CELL_SIZE), -(-w // CELL_SIZE))
+        rows, cols = np.arange(h), np.arange(w)
+
+        # Buffer milik engine sendiri: peta harus tetap valid selama engine dipakai
+        context = FeatureContext(gray)
+
+        # Fine: kode LBP setiap pusat grid sampling, dihitung di sel tempat pusatnya
+        center = gray[radius:max(h - radius, radius):step, radius:max(w - radius, radius):step]
+        codes = _lbp_codes_uint8(gray, center, radius, cfg["neighbors"], step, context.buffers)
+        self._fine = _integral_histogram(codes, np.arange(radius, h - radius, step),
+                                         np.arange(radius, w - radius, step), grid, 256)
+
+        # Coarse: bin gradien dengan rentang seluruh citra (tepi bin sama dengan np.histogram)
+        self.magnitude = context.magnitude
+        self._max = self.magnitude.max()
+        edges = np.histogram_bin_edges(self.magnitude, bins=self.num_bins, range=(0, self._max + 1e-8))
+        bins = np.empty((h, w), dtype=np.uint8)
+        for y in range(0, h, CELL_SIZE):
+            bins[y:y + CELL_SIZE] = _bin_indices(self.magnitude[y:y + CELL_SIZE], edges)
+        self._coarse = _integral_histogram(bins, rows, cols, grid, self.num_bins)
+        starts_y, starts_x = rows[::CELL_SIZE], cols[::CELL_SIZE]
+        self._cell_max = np.maximum.reduceat(np.maximum.reduceat(self.magnitude, starts_y, axis=0),
+                                             starts_x, axis=1)
+
+        # DOR: indeks offset dominan setiap piksel
+        window_size = cfg["window_size"]
+        pad = window_size // 2
+        dom_idx = _dor_dominant_indices(context.padded(pad), 0, h, w, window_size, context.buffers)
+        self._dor = _integral_histogram(dom_idx, rows, cols, grid, window_size * window_size)
+
+    def nbytes(self):
+        """Memory held by the maps and integral histograms."""
+        return (self._fine.nbytes + self._coarse.nbytes + self._dor.nbytes
+                + self.magnitude.nbytes + self._cell_max.nbytes)
+
+    def _cells(self, start, stop, length):
+        start, stop = np.asarray(start, dtype=np.intp), np.asarray(stop, dtype=np.intp)
+        if np.any(start % CELL_SIZE) or np.any((stop % CELL_SIZE != 0) & (stop != length)):
+            raise ValueError(f"Window borders must be multiples of CELL_SIZE ({CELL_SIZE}) "
+                             f"or the image border")
+        if np.any(start < 0) or np.any(stop > length) or np.any(stop <= start):
+            raise ValueError("Window outside the image or empty")
+        return start // CELL_SIZE, -(-stop // CELL_SIZE)
+
+    def windows(self, ys, xs, height, width):
+        """
+        Feature vectors of many windows of the same size.
+
+        Args:
+            ys, xs: Window origins (1-D arrays of equal length, cell-aligned)
+            height, width: Window size; the far border must be cell-aligned
+                or the image border
+
+        Returns:
+            np.ndarray float32 of shape (len(ys), 313)
+        """
+        ys, xs = np.atleast_1d(ys), np.atleast_1d(xs)
+        if ys.ndim != 1 or ys.shape != xs.shape:
+            raise ValueError(f"ys and xs must be 1-D arrays of equal length, got {ys.shape} and {xs.shape}")
+        h, w = self.shape
+        cy0, cy1 = self._cells(ys, ys + height, h)
+        cx0, cx1 = self._cells(xs, xs + width, w)
+
+        fine = _normalize(window_sums(self._fine, cy0, cy1, cx0, cx1))
+        coarse = _normalize(window_sums(self._coarse, cy0, cy1, cx0, cx1))
+        dor = _normalize(window_sums(self._dor, cy0, cy1, cx0, cx1))
+
+        if self.coarse_range == "region":
+            for i, (y, x) in enumerate(zip(ys, xs)):
+                window_max = self._cell_max[cy0[i]:cy1[i], cx0[i]:cx1[i]].max()
+                # Jendela yang memuat maksimum citra memakai bin yang sama: integral sudah tepat
+                if window_max != self._max:
+                    hist, _ = np.histogram(self.magnitude[y:y + height, x:x + width],
+                                           bins=self.num_bins, range=(0, window_max + 1e-8))
+                    coarse[i] = _normalize(hist)
+
+        features = np.concatenate([fine, coarse, dor], axis=1)
+        if features.shape[1] != FEATURE_DIM:
+            raise ValueError(f"FEATURE_CONFIG gives {features.shape[1]} features, "
+                             f"the models expect {FEATURE_DIM}")
+        return features
+
+    def features(self, y0=0, y1=None, x0=0, x1=None):
+        """
+        Feature vector (313 dims) of the window [y0, y1) x [x0, x1).
+
+        The default window is the whole image, whose vector equals
+        ``extract_features(gray)``.
+        """
+        h, w = self.shape
+        y1 = h if y1 is None else y1
+        x1 = w if x1 is None else x1
+        return self.windows([y0], [x0], y1 - y0, x1 - x0)[0]
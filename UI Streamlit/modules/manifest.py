@@ -0,0 +1,124 @@
+"""
+Dataset manifest for corn leaf disease classification.
+
+The manifest is a table with one row per image of a ``base_dir/<class>``
+dataset: path, label, file size, modification time (ns), dimensions and mean
+brightness. Every image is decoded exactly once to fill it, and the result
+is cached to a CSV (or Parquet) file. Later builds only decode the files
+whose size or mtime changed, so EDA plots and the training stage can read
+everything they need from the manifest instead of walking the directories
+again.
+"""
+
+import os
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from .dataset import IMAGE_EXTENSIONS, extract_dataset_features, scan_class_dirs
+
+MANIFEST_COLUMNS = ["filepath", "label", "bytes", "mtime_ns", "height", "width", "brightness"]
+
+
+def inspect_image(path):
+    """
+    Decode an image once and measure it.
+
+    Args:
+        path: Image file path
+
+    Returns:
+        np.ndarray [height, width, brightness] or None if the image cannot be read
+    """
+    img = cv2.imread(path)
+    if img is None:
+        return None
+
+    h, w = img.shape[:2]
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return np.array([h, w, gray.mean()], dtype="float64")
+
+
+def read_manifest(path):
+    """Read a cached manifest (CSV or Parquet, chosen by file extension)."""
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def write_manifest(df, path):
+    """Write a manifest (CSV or Parquet, chosen by file extension)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    if path.endswith(".parquet"):
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def build_manifest(base_dir, cache_path=None, n_jobs=1, extensions=IMAGE_EXTENSIONS, progress=True):
+    """
+    Build or refresh the manifest of a ``base_dir/<class>/<file>`` dataset.
+
+    Args:
+        base_dir: Dataset root with one folder per class
+        cache_path: CSV / Parquet file used as cache (None disables caching)
+        n_jobs: Number of worker processes used to decode images
+        extensions: Accepted image file extensions
+        progress: Show a progress bar while decoding
+
+    Returns:
+        pd.DataFrame with columns MANIFEST_COLUMNS. Images that cannot be
+        decoded keep NaN height, width and brightness.
+    """
+    paths, labels = scan_class_dirs(base_dir, extensions)
+    stats = [os.stat(p) for p in paths]
+
+    current = pd.DataFrame({
+        "filepath": paths,
+        "label": labels,
+        "bytes": [st.st_size for st in stats],
+        "mtime_ns": [st.st_mtime_ns for st in stats],
+    })
+
+    cached = None
+    if cache_path is not None and os.path.exists(cache_path):
+        cached = read_manifest(cache_path)
+        if list(cached.columns) != MANIFEST_COLUMNS:
+            cached = None
+
+    if cached is not None:
+        # Pakai ulang baris yang file-nya tidak berubah (ukuran dan mtime_ns sama; integer,
+        # agar perbandingan tidak bergantung pada pembulatan float di CSV)
+        merged = current.merge(
+            cached[["filepath", "bytes", "mtime_ns", "height", "width", "brightness"]],
+            on=["filepath", "bytes", "mtime_ns"],
+            how="left",
+        )
+        stale = merged["height"].isna().to_numpy()
+    else:
+        merged = current.assign(height=np.nan, width=np.nan, brightness=np.nan)
+        stale = np.ones(len(merged), dtype=bool)
+
+    stale_idx = np.flatnonzero(stale)
+    if len(stale_idx):
+        stale_paths = merged["filepath"].to_numpy()[stale_idx].tolist()
+        values, kept, _ = extract_dataset_features(
+            stale_paths, inspect_image, n_jobs=n_jobs, progress=progress, desc="Manifest",
+            dtype="float64",
+        )
+        if len(kept):
+            rows = stale_idx[kept]
+            merged.loc[rows, ["height", "width", "brightness"]] = values
+
+    manifest = merged[MANIFEST_COLUMNS].reset_index(drop=True)
+
+    if cache_path is not None and (len(stale_idx) or cached is None or len(cached) != len(manifest)):
+        write_manifest(manifest, cache_path)
+
+    return manifest
@@ -0,0 +1,264 @@
+"""
+Hot-path instrumentation for the corn leaf disease pipeline.
+
+Every pipeline stage (decode, preprocessing, Otsu, the three extractors,
+the model, validation gates) is wrapped in ``metrics.stage(name)``. Stage
+latencies go into fixed-bucket histograms with p50/p95/p99 estimates,
+alongside plain counters. The values can be exported as Prometheus text
+or a dict snapshot, and any number of hooks (e.g. structured logging) can
+observe individual timings.
+
+When metrics are disabled, ``stage()`` returns a shared no-op context
+manager and ``inc()`` returns immediately, so the overhead is a single
+flag check per call. Set the environment variable
+``CORNSHIELD_METRICS=0`` to start disabled.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket latensi (detik), skala log dari 50 µs sampai 10 s
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("_metrics", "_name", "_t0")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._name, time.perf_counter() - self._t0)
+        return False
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (cumulative export, like Prometheus).
+
+    Args:
+        buckets: Sorted upper bounds in seconds; +Inf is implicit
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside its bucket.
+
+        Returns:
+            float seconds, or None when the histogram is empty
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if total == 0:
+            return None
+
+        rank = q * total
+        cumulative = 0
+        for i, c in enumerate(counts):
+            if cumulative + c >= rank and c > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / c
+            cumulative += c
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """
+    Registry of stage histograms, counters and observation hooks.
+
+    Args:
+        enabled: Start enabled
+        buckets: Histogram buckets for every stage
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self._enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+        # Kedalaman paused() per thread: thread lain tetap tercatat
+        self._paused = threading.local()
+
+    @property
+    def enabled(self):
+        """Whether the calling thread records (globally enabled and not inside paused())."""
+        return self._enabled and not getattr(self._paused, "depth", 0)
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = value
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    @contextmanager
+    def paused(self):
+        """
+        Context manager that records nothing inside it (e.g. warm-up).
+
+        Only the calling thread is paused; concurrent requests on other
+        threads keep recording. Calls may be nested.
+        """
+        self._paused.depth = getattr(self._paused, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._paused.depth -= 1
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def add_hook(self, hook):
+        """Register ``hook(stage, seconds)``, called after every observation."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def stage(self, name):
+        """Context manager timing one execution of a pipeline stage."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def observe(self, name, seconds):
+        """Record a stage latency (seconds)."""
+        if not self.enabled:
+            return
+        hist = self._histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(name, Histogram(self.buckets))
+        hist.observe(seconds)
+        for hook in self._hooks:
+            hook(name, seconds)
+
+    def inc(self, name, value=1):
+        """Increase a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        Current values.
+
+        Returns:
+            dict with ``stages`` (name -> count, sum, p50, p95, p99 in seconds)
+            and ``counters`` (name -> value)
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "stages": {name: h.snapshot() for name, h in sorted(histograms.items())},
+            "counters": dict(sorted(counters.items())),
+        }
+
+    def prometheus_text(self, prefix="cornshield"):
+        """Export all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+
+        lines = []
+        name = f"{prefix}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Latency of pipeline stages.")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, hist in sorted(histograms.items()):
+            with hist._lock:
+                counts = list(hist.counts)
+                total, total_sum = hist.count, hist.sum
+            cumulative = 0
+            for bound, c in zip(hist.buckets, counts):
+                cumulative += c
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total_sum}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {total}')
+
+        for counter, value in sorted(counters.items()):
+            metric = f"{prefix}_{counter}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def logging_hook(logger=None, level=logging.DEBUG):
+    """
+    Hook that writes every stage observation as a structured JSON log line.
+
+    Example:
+        metrics.add_hook(logging_hook(logging.getLogger("cornshield")))
+    """
+    logger = logger or logging.getLogger("cornshield.metrics")
+
+    def hook(stage, seconds):
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({"stage": stage, "seconds": round(seconds, 6)}))
+
+    return hook
+
+
+# Registry global yang dipakai pipeline
+metrics = Metrics(enabled=os.environ.get("CORNSHIELD_METRICS", "1") != "0")
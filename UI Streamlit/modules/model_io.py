@@ -0,0 +1,197 @@
+"""
+Native XGBoost model format for corn leaf disease classification.
+
+The trained model is exported with ``Booster.save_model`` (UBJ or JSON,
+chosen by file extension) instead of a pickle of the sklearn wrapper.
+Loading a native booster is faster and keeps working across xgboost
+versions. Predictions go straight through ``Booster.inplace_predict``
+on float32 arrays, skipping the DMatrix construction and the
+``XGBClassifier`` wrapper.
+
+The exported file records the feature layout (dimension,
+FEATURE_VERSION and feature mode); loading a booster that does not match
+the 313-dim extractor output raises ValueError. The feature mode ("full"
+or "leaf") and the feature size (preprocessing target side, e.g. 128 for
+the low-resolution tier of the cascade) tell the pipeline how to extract
+features for this model; boosters exported before they were recorded are
+"full" at 256.
+
+Usage:
+    python -m modules.model_io                 # pkl -> model/xgb_best_model.ubj
+    python -m modules.model_io --format json
+    python -m modules.model_io --source xgb_leaf.pkl --mode leaf --output model/xgb_best_model_leaf.ubj
+    python -m modules.model_io --source xgb_128.pkl --size 128 --output model/xgb_best_model_128.ubj
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from .feature_extraction import (
+    DEFAULT_FEATURE_MODE, DEFAULT_FEATURE_SIZE, FEATURE_DIM, FEATURE_MODES, FEATURE_VERSION,
+)
+
+MODEL_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model"))
+PICKLE_MODEL_PATH = os.path.join(MODEL_DIR, "xgb_best_model.pkl")
+NATIVE_MODEL_PATH = os.path.join(MODEL_DIR, "xgb_best_model.ubj")
+# Model tier resolusi rendah untuk inferensi cascade (opsional)
+LOWRES_MODEL_PATH = os.path.join(MODEL_DIR, "xgb_best_model_128.ubj")
+
+# Satu thread memberi latensi terendah untuk prediksi satu baris
+DEFAULT_NTHREAD = 1
+
+
+class NativeModel:
+    """
+    Native XGBoost booster with the ``predict_proba`` interface of the pipeline.
+
+    Args:
+        booster: xgboost.Booster (multi:softprob)
+        nthread: Threads used by inplace_predict
+    """
+
+    def __init__(self, booster, nthread=DEFAULT_NTHREAD):
+        check_compatibility(booster)
+        booster.set_param({"nthread": nthread})
+        self.booster = booster
+        self.nthread = nthread
+        self.n_features_in_ = booster.num_features()
+        self.feature_mode = feature_mode_of(booster)
+        self.feature_size = feature_size_of(booster)
+
+    def predict_proba(self, features):
+        """
+        Class probabilities of a (n, 313) feature matrix.
+
+        Returns:
+            np.ndarray of shape (n, n_classes)
+        """
+        X = np.ascontiguousarray(features, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.booster.inplace_predict(X)
+
+
+def check_compatibility(booster):
+    """
+    Check that a booster was trained on the current feature layout.
+
+    Raises:
+        ValueError: feature dimension or recorded FEATURE_VERSION differs
+    """
+    n_features = booster.num_features()
+    if n_features != FEATURE_DIM:
+        raise ValueError(
+            f"Model expects {n_features} features, extractor produces {FEATURE_DIM}"
+        )
+    version = booster.attr("feature_version")
+    if version is not None and int(version) != FEATURE_VERSION:
+        raise ValueError(
+            f"Model was trained with feature version {version}, "
+            f"current extractor is version {FEATURE_VERSION}"
+        )
+
+    mode = feature_mode_of(booster)
+    if mode not in FEATURE_MODES:
+        raise ValueError(f"Model was trained with unknown feature mode {mode!r}")
+    mode_version = booster.attr("feature_mode_version")
+    if mode_version is not None and int(mode_version) != FEATURE_MODES[mode]:
+        raise ValueError(
+            f"Model was trained with {mode!r} mode version {mode_version}, "
+            f"current extractor is version {FEATURE_MODES[mode]}"
+        )
+
+
+def feature_mode_of(booster):
+    """Feature mode recorded in a booster ("full" if none was recorded)."""
+    return booster.attr("feature_mode") or DEFAULT_FEATURE_MODE
+
+
+def feature_size_of(booster):
+    """Preprocessing target side recorded in a booster (DEFAULT_FEATURE_SIZE if none)."""
+    return int(booster.attr("feature_size") or DEFAULT_FEATURE_SIZE)
+
+
+def export_native_model(model, path=NATIVE_MODEL_PATH, mode=None, size=None):
+    """
+    Save the booster of a trained model in the native XGBoost format.
+
+    Args:
+        model: XGBClassifier or xgboost.Booster
+        path: Output file; ``.ubj`` (binary) or ``.json``
+        mode: Feature mode the model was trained on; None keeps the mode
+            already recorded in the booster ("full" if none)
+        size: Preprocessing target side (pixels) the model was trained on;
+            None keeps the recorded size (DEFAULT_FEATURE_SIZE if none)
+
+    Returns:
+        path
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    if mode is not None:
+        if mode not in FEATURE_MODES:
+            raise ValueError(f"Unknown feature mode {mode!r}, expected one of {tuple(FEATURE_MODES)}")
+        booster.set_attr(feature_mode=mode, feature_mode_version=str(FEATURE_MODES[mode]))
+    if size is not None:
+        booster.set_attr(feature_size=str(int(size)))
+    check_compatibility(booster)
+    mode = feature_mode_of(booster)
+    booster.set_attr(
+        feature_dim=str(FEATURE_DIM),
+        feature_version=str(FEATURE_VERSION),
+        feature_mode=mode,
+        feature_mode_version=str(FEATURE_MODES[mode]),
+        feature_size=str(feature_size_of(booster)),
+    )
+
+    # Tulis ke file sementara lalu rename, agar proses yang hot-reload
+    # tidak pernah membaca file setengah jadi
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.tmp{ext}"
+    booster.save_model(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_native_model(path=NATIVE_MODEL_PATH, nthread=DEFAULT_NTHREAD):
+    """
+    Load a native booster saved by export_native_model.
+
+    Returns:
+        NativeModel
+    """
+    import xgboost as xgb
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file not found at: {path}")
+    return NativeModel(xgb.Booster(model_file=path), nthread)
+
+
+def load_pickle_model(path=PICKLE_MODEL_PATH):
+    """Load the pickled XGBClassifier (legacy format)."""
+    import joblib
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file not found at: {path}")
+    return joblib.load(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the pickled model to the native XGBoost format")
+    parser.add_argument("--source", default=PICKLE_MODEL_PATH)
+    parser.add_argument("--format", choices=("ubj", "json"), default="ubj")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--mode", choices=tuple(FEATURE_MODES), default=None,
+                        help="Feature mode the model was trained on (default: full)")
+    parser.add_argument("--size", type=int, default=None,
+                        help="Preprocessing target side the model was trained on (default: 256)")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(NATIVE_MODEL_PATH)[0] + "." + args.format
+    export_native_model(load_pickle_model(args.source), output, mode=args.mode, size=args.size)
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
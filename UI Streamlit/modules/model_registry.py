@@ -0,0 +1,163 @@
+"""
+Thread-safe model registry for corn leaf disease classification.
+
+The registry holds several named model artifacts (e.g. "default",
+"candidate"). Each one is loaded once, under a per-name lock, on first
+use. While serving, the artifact's mtime is checked at most every
+``check_interval`` seconds; when the file changed, the new model is
+loaded and swapped in with a single reference assignment. Requests that
+already hold the previous ModelVersion finish on it, and a failed reload
+(e.g. a half-copied file) keeps the previous version in service.
+
+Every loaded model gets a version string ``<name>@<sha256 prefix>`` of the
+artifact bytes, so each prediction can report which model served it.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import warnings
+from collections import namedtuple
+
+ModelVersion = namedtuple("ModelVersion", ["name", "version", "model", "path", "mtime", "loaded_at"])
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Named, versioned and hot-reloadable models.
+
+    Args:
+        loader: Callable ``loader(path)`` returning a model with ``predict_proba``
+        check_interval: Seconds between artifact mtime checks
+            (None disables hot reload)
+    """
+
+    def __init__(self, loader, check_interval=2.0):
+        self.loader = loader
+        self.check_interval = check_interval
+        self.default = None
+        self._paths = {}
+        self._loaded = {}
+        self._checked = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, default=False):
+        """
+        Register a model artifact under a name (not loaded yet).
+
+        The first registered name becomes the default.
+        """
+        with self._lock:
+            self._paths[name] = path
+            self._locks.setdefault(name, threading.Lock())
+            self._loaded.pop(name, None)
+            if default or self.default is None:
+                self.default = name
+
+    def set_default(self, name):
+        if name not in self._paths:
+            raise KeyError(f"Unknown model: {name}")
+        self.default = name
+
+    def names(self):
+        return list(self._paths)
+
+    def get(self, name=None):
+        """
+        Model version to serve a request with.
+
+        Loads the model on first use and reloads it when the artifact on
+        disk changed since the last check.
+
+        Returns:
+            ModelVersion
+        """
+        name = name or self.default
+        if name not in self._paths:
+            raise KeyError(f"Unknown model: {name}")
+
+        entry = self._loaded.get(name)
+        if entry is None:
+            return self._load(name)
+
+        if self.check_interval is not None:
+            now = time.monotonic()
+            if now - self._checked.get(name, 0.0) >= self.check_interval:
+                self._checked[name] = now
+                if _mtime(self._paths[name]) != entry.mtime:
+                    return self._load(name)
+        return entry
+
+    def reload(self, name=None):
+        """Force a reload of a model from its artifact."""
+        return self._load(name or self.default, force=True)
+
+    def invalidate(self):
+        """Drop every loaded model; the next ``get`` loads them again."""
+        with self._lock:
+            self._loaded.clear()
+
+    def _load(self, name, force=False):
+        with self._locks[name]:
+            path = self._paths[name]
+            current = self._loaded.get(name)
+            mtime = _mtime(path)
+            # Thread lain mungkin sudah memuat versi yang sama selama menunggu lock
+            if current is not None and not force and current.mtime == mtime:
+                return current
+
+            try:
+                if mtime is None:
+                    raise FileNotFoundError(f"Model file not found at: {path}")
+                model = self.loader(path)
+                entry = ModelVersion(
+                    name=name,
+                    version=f"{name}@{_file_digest(path)[:12]}",
+                    model=model,
+                    path=path,
+                    mtime=mtime,
+                    loaded_at=time.time(),
+                )
+            except Exception as e:
+                if current is None:
+                    raise
+                warnings.warn(f"Reloading model {name!r} failed, keeping {current.version}: {e}")
+                return current
+
+            self._loaded[name] = entry
+            self._checked[name] = time.monotonic()
+            return entry
+
+    def versions(self):
+        """
+        Registered models and the version currently loaded.
+
+        Returns:
+            dict name -> {path, version, loaded_at, default}
+        """
+        return {
+            name: {
+                "path": path,
+                "version": self._loaded[name].version if name in self._loaded else None,
+                "loaded_at": self._loaded[name].loaded_at if name in self._loaded else None,
+                "default": name == self.default,
+            }
+            for name, path in self._paths.items()
+        }
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -3,59 +3,337 @@ Pipeline module for corn leaf disease classification.
 
 This module combines preprocessing, segmentation, and feature extraction
 into a single prediction pipeline using the trained XGBoost model.
+
+Every stage is timed through ``modules.metrics`` (decode, preprocess,
+segmentation, the three extractors, the validation gates and the model);
+see ``get_metrics`` and ``metrics.disable()``.
+
+Models are served from a ModelRegistry: loaded once under a lock,
+hot-reloaded when the artifact on disk changes, and every prediction dict
+reports the ``model_version`` that scored it. A request resolves its
+ModelVersion once and uses it for both feature extraction and scoring,
+so a reload in between never mixes two versions.
+
+Features are extracted in the feature mode and at the resolution recorded
+in the serving model ("full" or "leaf", see ``modules.feature_extraction``;
+``feature_size``, 256 by default), so a model retrained on leaf-restricted
+or low-resolution features is served with matching features.
+
+``predict_image_cascade`` first scores a low-resolution copy of the image
+with a model trained at that resolution ("lowres", model/xgb_best_model_128.ubj)
+and only repeats extraction at 256x256 when the low tier is not confident
+(CONF_THRESHOLD / MIN_CONF_MARGIN). See ``get_cascade_stats``.
+
+``predict_image_tiled`` scores large photos tile by tile at native
+resolution and returns a per-tile class heatmap (see ``modules.tiling``).
+With ``engine="integral"`` the tile features come from one integral-histogram
+pass over the frame (``modules.integral_features``) instead of one
+extraction per tile.
 """
 
+import io
 import os
-import joblib
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
 import numpy as np
+from PIL import Image
 
-from .preprocessing import preprocess_pil_image
+from .preprocessing import encoded_bytes, load_rgb, preprocess_rgb_image
 from .segmentation import segment_otsu
-from .feature_extraction import extract_features
+from .feature_extraction import DEFAULT_FEATURE_MODE, DEFAULT_FEATURE_SIZE, extract_features, thread_buffers
+from .feature_cache import FeatureCache, feature_cache_config, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from .validation import GateCascade, ValidationContext, is_prediction_confident
+from .metrics import metrics
+from .model_io import (
+    LOWRES_MODEL_PATH, NATIVE_MODEL_PATH, PICKLE_MODEL_PATH, load_native_model, load_pickle_model,
+)
+from .model_registry import ModelRegistry
+from .tree_ensemble import TreeEnsemble
+from . import tiling
+from .integral_features import CELL_SIZE, IntegralFeatures
 from .utils import CLASS_MAP
 
-# Cache model agar tidak load berulang
-_model = None
+# Backend penilaian model: "xgboost" (booster) atau "numpy" (TreeEnsemble)
+PREDICTORS = ("xgboost", "numpy")
+_predictor = os.environ.get("CORNSHIELD_PREDICTOR", "xgboost")
+
+# Ekstraksi fitur tile: "tiles" (per tile) atau "integral" (integral histogram)
+TILE_ENGINES = ("tiles", "integral")
+TILE_ENGINE = os.environ.get("CORNSHIELD_TILE_ENGINE", "tiles")
+
+# Cache fitur di disk (nonaktif secara default)
+_feature_cache = None
+
+# Gate validasi murah-dulu sebelum ekstraksi fitur
+_gate_cascade = GateCascade()
+
+
+def _load_artifact(path):
+    if _predictor not in PREDICTORS:
+        raise ValueError(f"Unknown predictor {_predictor!r}, expected one of {PREDICTORS}")
+
+    if path.endswith((".ubj", ".json")):
+        model = load_native_model(path)
+    else:
+        model = load_pickle_model(path)
+    return TreeEnsemble.from_model(model) if _predictor == "numpy" else model
+
+
+# Registry model: load sekali (thread-safe), reload otomatis saat file berubah.
+# Booster native (model/xgb_best_model.ubj) diutamakan, pickle sebagai cadangan.
+_registry = ModelRegistry(_load_artifact)
+_registry.register(
+    "default", NATIVE_MODEL_PATH if os.path.exists(NATIVE_MODEL_PATH) else PICKLE_MODEL_PATH
+)
+
+# Tier resolusi rendah cascade, didaftarkan jika modelnya sudah dilatih
+CASCADE_MODEL = "lowres"
+if os.path.exists(LOWRES_MODEL_PATH):
+    _registry.register(CASCADE_MODEL, LOWRES_MODEL_PATH)
+
+
+def load_model(name=None):
+    """Load trained XGBoost model (the current version of a registered model)."""
+    return _registry.get(name).model
+
+
+def get_model(name=None):
+    """
+    Current version of a registered model.
+
+    Returns:
+        ModelVersion (name, version, model, path, mtime, loaded_at)
+    """
+    return _registry.get(name)
+
+
+def register_model(name, path, default=False):
+    """
+    Register another model artifact (.ubj / .json / .pkl) under a name.
+
+    Args:
+        name: Model name, e.g. "candidate"
+        path: Artifact path; reloaded automatically when the file changes
+        default: Serve predictions with this model unless a name is given
+    """
+    _registry.register(name, path, default)
+
+
+def set_default_model(name):
+    """Serve predictions with a registered model by default."""
+    _registry.set_default(name)
+
+
+def get_model_versions():
+    """Registered models and their loaded versions (see ModelRegistry.versions)."""
+    return _registry.versions()
+
+
+def warm_up(size=256):
+    """
+    Load the default model and run one gated prediction on a synthetic leaf.
+
+    Loads the model, builds the extractor lookup tables and runs every
+    stage once, so the first real request does not pay cold-start cost.
+    A private cascade is used and metrics are paused, so neither the gate
+    statistics nor the stage latencies include the one-time costs.
+
+    Returns:
+        dict with ``seconds`` (warm-up wall time) and ``model_version``
+    """
+    t0 = time.perf_counter()
+    entry = _registry.get()
+
+    rng = np.random.default_rng(0)
+    leaf = np.zeros((size, size, 3), dtype=np.uint8)
+    leaf[..., 1] = rng.integers(90, 200, (size, size))
+    leaf[..., 0] = rng.integers(20, 80, (size, size))
+    with metrics.paused():
+        predict_image_gated(Image.fromarray(leaf), cascade=GateCascade())
+
+    return {"seconds": time.perf_counter() - t0, "model_version": entry.version}
+
+
+def set_predictor(name):
+    """
+    Select the model backend.
+
+    Args:
+        name: "xgboost" (default; fastest for large batches) or "numpy"
+            (pure-NumPy TreeEnsemble; lowest latency for single images)
+    """
+    global _predictor
+    if name not in PREDICTORS:
+        raise ValueError(f"Unknown predictor {name!r}, expected one of {PREDICTORS}")
+    _predictor = name
+    _registry.invalidate()
+
+
+def enable_feature_cache(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Enable the persistent feature cache for predict_image / predict_images."""
+    global _feature_cache
+    _feature_cache = FeatureCache(cache_dir, max_bytes)
+    return _feature_cache
+
 
+def disable_feature_cache():
+    """Disable the persistent feature cache."""
+    global _feature_cache
+    _feature_cache = None
 
-def load_model():
-    """Load trained XGBoost model."""
-    global _model
-    if _model is None:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(current_dir, "..", "model", "xgb_best_model.pkl")
 
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found at: {model_path}")
+def _image_bytes(pil_image):
+    header = f"{pil_image.mode}:{pil_image.size[0]}x{pil_image.size[1]}:".encode("ascii")
+    return header + pil_image.tobytes()
 
-        _model = joblib.load(model_path)
 
-    return _model
+def _cache_data(pil_image):
+    # Bytes file terenkode (key sama dengan ml.py, tanpa decode);
+    # piksel hasil decode hanya untuk gambar yang dibuat di memori
+    data = encoded_bytes(pil_image)
+    return data if data is not None else _image_bytes(pil_image)
 
 
-def predict_image(pil_image):
+def _cached_features(pil_image, target_size, entry):
+    """
+    Feature vector from the cache, looked up before the image is decoded.
+
+    Returns:
+        tuple: (features or None, cache data); features is None when the
+        cache is disabled, on a miss or for an image without encoded bytes
+    """
+    if _feature_cache is None:
+        return None, None
+    data = encoded_bytes(pil_image)
+    if data is None:
+        return None, None
+    config = feature_cache_config(target_size, mode=_feature_mode(entry))
+    features = _feature_cache.get(_feature_cache.make_key(data, config))
+    if features is not None:
+        metrics.inc("feature_cache_hits")
+    return features, data
+
+
+def _feature_mode(entry):
+    return getattr(entry.model, "feature_mode", DEFAULT_FEATURE_MODE)
+
+
+def _feature_size(entry):
+    return getattr(entry.model, "feature_size", DEFAULT_FEATURE_SIZE)
+
+
+def get_feature_mode(model_name=None):
+    """Feature mode ("full" or "leaf") the model was trained on."""
+    return _feature_mode(_registry.get(model_name))
+
+
+def get_feature_size(model_name=None):
+    """Preprocessing target side (pixels) the model was trained on."""
+    return _feature_size(_registry.get(model_name))
+
+
+def _extract_features(pil_image, gray, segmentation, entry, data=None):
+    # Mode fitur dari ModelVersion yang sama yang nanti menilai fitur ini
+    mode = _feature_mode(entry)
+    # Buffer kerja ekstraktor dipakai ulang per thread (server/batcher)
+    buffers = thread_buffers()
+    with metrics.stage("features"):
+        if _feature_cache is None:
+            return extract_features(gray, metrics.stage, mode, segmentation, buffers)
+        return _feature_cache.get_or_compute(
+            data if data is not None else _cache_data(pil_image),
+            feature_cache_config(gray.shape[::-1], mode=mode),
+            lambda: extract_features(gray, metrics.stage, mode, segmentation, buffers),
+        )
+
+
+def _preprocess(pil_image, target_size):
+    with metrics.stage("decode"):
+        img_rgb = load_rgb(pil_image, target_size)
+    with metrics.stage("preprocess"):
+        return preprocess_rgb_image(img_rgb, target_size)
+
+
+def _segment(gray):
+    with metrics.stage("segmentation"):
+        return segment_otsu(gray)
+
+
+def score_features(features, model_name=None, entry=None):
+    """
+    Score a (n, 313) feature matrix with the current version of a model.
+
+    Args:
+        features: (n, 313) feature matrix
+        model_name: Registered model to use (default: the default model)
+        entry: ModelVersion the features were extracted for (see
+            get_model / prepare_features); takes precedence over model_name,
+            so a hot reload in between cannot mix two versions
+
+    Returns:
+        tuple: (probabilities of shape (n, n_classes), model version string)
+    """
+    entry = entry or _registry.get(model_name)
+    metrics.inc("model_calls")
+    metrics.inc("model_rows", len(features))
+    with metrics.stage("predict_proba"):
+        return entry.model.predict_proba(features), entry.version
+
+
+def _run_gates(cascade, ctx):
+    # Decode dipaksa di sini agar waktunya tidak tercampur ke gate pertama
+    with metrics.stage("decode"):
+        ctx.rgb
+    verdict = cascade.run(ctx)
+    if metrics.enabled:
+        for check in verdict.checks.values():
+            metrics.observe(f"gate_{check.name}", check.seconds)
+        metrics.inc("images")
+        if not verdict.passed:
+            metrics.inc("rejected")
+    return verdict
+
+
+def predict_image(pil_image, return_segmentation=True):
     """
     Complete prediction pipeline.
 
+    The feature cache is checked before the image is decoded; on a hit the
+    image is only decoded when the segmentation is requested.
+
+    Args:
+        pil_image: PIL Image
+        return_segmentation: Compute the Otsu mask for the result (None otherwise)
+
     Returns:
         pred_class (str)
         probabilities (np.ndarray)
-        segmentation (np.ndarray)
+        segmentation (np.ndarray or None)
         confidence (float)
     """
 
-    # 1. Preprocessing
-    _, gray = preprocess_pil_image(pil_image)
+    metrics.inc("images")
+    # Satu versi model untuk seluruh request (ekstraksi dan penilaian)
+    entry = _registry.get()
+    size = _feature_size(entry)
+
+    # Cache hit: ekstraksi dilewati, decode hanya jika segmentasi diminta
+    features, data = _cached_features(pil_image, (size, size), entry)
+    segmentation = None
+    if features is None or return_segmentation:
+        # 1. Preprocessing (resolusi tempat model dilatih)
+        gray = _preprocess(pil_image, (size, size)).gray
 
-    # 2. Segmentasi Otsu
-    segmentation = segment_otsu(gray)
+        # 2. Segmentasi Otsu
+        segmentation = _segment(gray)
 
-    # 3. Ekstraksi fitur (313 dimensi)
-    features = extract_features(gray).reshape(1, -1)
+        # 3. Ekstraksi fitur (313 dimensi)
+        if features is None:
+            features = _extract_features(pil_image, gray, segmentation, entry, data)
 
     # 4. Prediksi
-    model = load_model()
-    probabilities = model.predict_proba(features)[0]
+    probabilities = score_features(features.reshape(1, -1), entry=entry)[0][0]
     pred_idx = int(np.argmax(probabilities))
 
     pred_class = CLASS_MAP[pred_idx]
@@ -64,6 +342,462 @@ def predict_image(pil_image):
     return pred_class, probabilities, segmentation, confidence
 
 
+def predict_image_cascade(pil_image, low_model=CASCADE_MODEL, model_name=None,
+                          return_segmentation=False):
+    """
+    Confidence-driven multi-resolution prediction.
+
+    The image is decoded once. Features are first extracted at the
+    resolution of ``low_model`` and scored by it; only when the top-1
+    probability or its margin is below CONF_THRESHOLD / MIN_CONF_MARGIN
+    (``is_prediction_confident``) are features extracted again at the
+    resolution of the full model. If ``low_model`` is not registered the
+    full tier is used directly.
+
+    Args:
+        pil_image: PIL Image, file path or raw image bytes
+        low_model: Registered low-resolution model (default: "lowres")
+        model_name: Full-resolution model (default: the default model)
+        return_segmentation: Include the Otsu mask of the deciding tier
+
+    Returns:
+        dict like the entries of predict_images, plus ``resolution``
+        (target side of the tier that decided) and ``escalated``
+    """
+    pil_image = open_image(pil_image)
+    metrics.inc("images")
+
+    # Versi model tiap tier diambil sekali per request
+    full_entry = _registry.get(model_name)
+    full_size = _feature_size(full_entry)
+    tiers = [(full_size, full_entry)]
+    if low_model in _registry.names():
+        low_entry = _registry.get(low_model)
+        low_size = _feature_size(low_entry)
+        if low_size < full_size:
+            tiers.insert(0, (low_size, low_entry))
+
+    img_rgb = None
+    for tier, (size, entry) in enumerate(tiers):
+        with metrics.stage(f"cascade_{size}"):
+            features, data = (None, None) if return_segmentation else \
+                _cached_features(pil_image, (size, size), entry)
+            segmentation = None
+            if features is None:
+                # Decode sekali (saat pertama dibutuhkan) untuk semua tier
+                if img_rgb is None:
+                    with metrics.stage("decode"):
+                        img_rgb = load_rgb(pil_image, (full_size, full_size))
+                with metrics.stage("preprocess"):
+                    gray = preprocess_rgb_image(img_rgb, (size, size)).gray
+                segmentation = _segment(gray) if return_segmentation else None
+                features = _extract_features(pil_image, gray, segmentation, entry, data)
+            probabilities, version = score_features(features.reshape(1, -1), entry=entry)
+        probabilities = probabilities[0]
+
+        if tier == len(tiers) - 1 or is_prediction_confident(probabilities):
+            break
+        metrics.inc(f"cascade_escalated_{size}")
+
+    metrics.inc(f"cascade_resolved_{size}")
+    result = prediction_dict(probabilities, segmentation, version)
+    result["resolution"] = size
+    result["escalated"] = tier > 0
+    return result
+
+
+def get_cascade_stats(model_name=None):
+    """
+    How often each cascade tier decided a request, and the latency saved.
+
+    The saving is estimated against scoring every request at the full
+    tier only: requests x mean full-tier latency, minus the time actually
+    spent in all tiers (including low-tier work of escalated requests).
+    The full tier is the resolution of the full model; until it has been
+    measured (no request escalated yet) the saving is unknown.
+
+    Args:
+        model_name: Full-resolution model of the cascade (default: the default model)
+
+    Returns:
+        dict with ``resolved`` (size -> count), ``share`` (size -> fraction),
+        ``mean_seconds`` (size -> mean tier latency) and
+        ``mean_saved_seconds`` (per cascade request; None while unknown)
+    """
+    snapshot = metrics.snapshot()
+    resolved = {
+        int(name.rsplit("_", 1)[1]): count
+        for name, count in snapshot["counters"].items()
+        if name.startswith("cascade_resolved_")
+    }
+    mean_seconds = {
+        int(name.rsplit("_", 1)[1]): stage["sum"] / stage["count"]
+        for name, stage in snapshot["stages"].items()
+        if name.startswith("cascade_") and name.rsplit("_", 1)[1].isdigit() and stage["count"]
+    }
+    total = sum(resolved.values())
+    saved = None
+    full_size = get_feature_size(model_name)
+    if total and full_size in mean_seconds:
+        full_only = total * mean_seconds[full_size]
+        spent = sum(
+            stage["sum"] for name, stage in snapshot["stages"].items()
+            if name.startswith("cascade_") and name.rsplit("_", 1)[1].isdigit()
+        )
+        saved = (full_only - spent) / total
+    return {
+        "resolved": dict(sorted(resolved.items())),
+        "share": {size: count / total for size, count in sorted(resolved.items())} if total else {},
+        "mean_seconds": dict(sorted(mean_seconds.items())),
+        "mean_saved_seconds": saved,
+    }
+
+
+def _tile_features(gray, mode, n_jobs):
+    # Satu set buffer ekstraktor per thread (thread_buffers)
+    def extract(tile_gray):
+        return extract_features(tile_gray, mode=mode, buffers=thread_buffers())
+
+    if n_jobs == 1 or len(gray) == 1:
+        return [extract(g) for g in gray]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(extract, gray))
+
+
+def _integral_tile_features(gray, ys, xs, tile_size):
+    # Peta fitur hanya untuk kotak pembatas tile yang dinilai (awal tile sudah kelipatan CELL_SIZE)
+    top, left = ys.min(), xs.min()
+    engine = IntegralFeatures(gray[top:ys.max() + tile_size, left:xs.max() + tile_size])
+    return engine.windows(ys - top, xs - left, tile_size, tile_size)
+
+
+def predict_image_tiled(source, tile_size=tiling.TILE_SIZE, stride=None, model_name=None,
+                        n_jobs=None, max_side=tiling.MAX_SIDE, engine=None):
+    """
+    Tiled high-resolution prediction with a per-tile class heatmap.
+
+    The frame is covered by overlapping ``tile_size`` tiles at native
+    resolution (larger than ``max_side`` is shrunk first). Tiles that the
+    Otsu / green gate marks as background are skipped; the features of the
+    remaining tiles are extracted (in ``n_jobs`` threads) and scored with a
+    single model call.
+
+    With ``engine="integral"`` the LBP, gradient and DOR maps of the scored
+    area are computed once and every tile vector is read from their
+    integral histograms (``modules.integral_features``); tile origins are
+    then multiples of CELL_SIZE. Tile borders see their real neighbours
+    instead of reflect padding, so the vectors differ slightly from
+    per-tile extraction. Models in the "leaf" feature mode and tile sizes
+    that are not a multiple of CELL_SIZE always use per-tile extraction.
+
+    Args:
+        source: PIL Image, file path or raw image bytes
+        tile_size: Tile side in pixels
+        stride: Step between tiles (default: 25% overlap)
+        model_name: Registered model to use (default: the default model)
+        n_jobs: Extraction threads (default: os.cpu_count())
+        max_side: Longest frame side before tiling
+        engine: "tiles" (extract every tile) or "integral"
+            (default: TILE_ENGINE / CORNSHIELD_TILE_ENGINE)
+
+    Returns:
+        dict with ``pred_class`` / ``probabilities`` / ``confidence``
+        (aggregated verdict, see ``tiling.aggregate_tiles``; None when every
+        tile is background), ``heatmap`` (rows x cols x n_classes, NaN for
+        skipped tiles), ``tile_rows`` / ``tile_cols`` (tile origins),
+        ``leaf_ratio`` (rows x cols), ``vote_share``, ``tiles_scored``,
+        ``tile_size``, ``frame_size`` (width, height) and ``model_version``
+    """
+    engine = engine or TILE_ENGINE
+    if engine not in TILE_ENGINES:
+        raise ValueError(f"Unknown tile engine {engine!r}, expected one of {TILE_ENGINES}")
+    pil_image = open_image(source)
+    metrics.inc("images")
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    entry = _registry.get(model_name)
+    mode = getattr(entry.model, "feature_mode", DEFAULT_FEATURE_MODE)
+    if mode != "full" or tile_size % CELL_SIZE:
+        engine = "tiles"
+    align = CELL_SIZE if engine == "integral" else 1
+
+    with metrics.stage("decode"):
+        img_rgb = tiling.fit_frame(load_rgb(pil_image), tile_size, max_side)
+    frame_h, frame_w = img_rgb.shape[:2]
+    ys = tiling.tile_origins(frame_h, tile_size, stride, align)
+    xs = tiling.tile_origins(frame_w, tile_size, stride, align)
+
+    with metrics.stage("tile_gate"):
+        leaf_ratio, green_ratio = tiling.tile_coverage(img_rgb, ys, xs, tile_size)
+        kept = np.argwhere(tiling.tile_gate(leaf_ratio, green_ratio))
+    metrics.inc("tiles", leaf_ratio.size)
+    metrics.inc("tiles_scored", len(kept))
+
+    n_classes = len(CLASS_MAP)
+    heatmap = np.full((len(ys), len(xs), n_classes), np.nan, dtype=np.float32)
+    result = {
+        "pred_class": None,
+        "probabilities": None,
+        "confidence": None,
+        "heatmap": heatmap,
+        "tile_rows": ys,
+        "tile_cols": xs,
+        "leaf_ratio": leaf_ratio,
+        "vote_share": None,
+        "tiles_scored": len(kept),
+        "tile_size": tile_size,
+        "frame_size": (frame_w, frame_h),
+        "model_version": entry.version,
+    }
+    if not len(kept):
+        return result
+
+    with metrics.stage("preprocess"):
+        gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
+    with metrics.stage("tile_features"):
+        if engine == "integral":
+            features = _integral_tile_features(gray, ys[kept[:, 0]], xs[kept[:, 1]], tile_size)
+        else:
+            tiles = [gray[ys[i]:ys[i] + tile_size, xs[j]:xs[j] + tile_size] for i, j in kept]
+            features = np.stack(_tile_features(tiles, mode, n_jobs))
+
+    metrics.inc("model_calls")
+    metrics.inc("model_rows", len(features))
+    with metrics.stage("predict_proba"):
+        probabilities = entry.model.predict_proba(features)
+    heatmap[kept[:, 0], kept[:, 1]] = probabilities
+
+    weights = leaf_ratio[kept[:, 0], kept[:, 1]]
+    pred_idx, mean_probabilities, vote_share = tiling.aggregate_tiles(probabilities, weights)
+    result.update(
+        pred_class=CLASS_MAP[pred_idx],
+        probabilities=mean_probabilities,
+        confidence=float(vote_share[pred_idx]) if vote_share.sum() else float(mean_probabilities[pred_idx]),
+        vote_share=vote_share,
+    )
+    return result
+
+
+def predict_image_gated(pil_image, cascade=None):
+    """
+    Prediction pipeline with a cheap-first validation cascade.
+
+    The validation gates run in order of increasing cost on shared, lazily
+    computed intermediates. If a gate rejects the image, feature extraction
+    and the model are skipped entirely.
+
+    Args:
+        pil_image: PIL Image
+        cascade: GateCascade to use (default: the module-wide cascade)
+
+    Returns:
+        tuple: (verdict, prediction)
+            - verdict: ValidationVerdict
+            - prediction: (pred_class, probabilities, segmentation, confidence)
+              as returned by predict_image, or None if a gate rejected the image
+    """
+    cascade = cascade or _gate_cascade
+    entry = _registry.get()
+    size = _feature_size(entry)
+    ctx = ValidationContext(pil_image, target_size=(size, size))
+
+    verdict = _run_gates(cascade, ctx)
+    if not verdict.passed:
+        return verdict, None
+
+    features = _extract_features(pil_image, ctx.gray, ctx.segmentation, entry).reshape(1, -1)
+
+    probabilities = score_features(features, entry=entry)[0][0]
+    pred_idx = int(np.argmax(probabilities))
+
+    prediction = (CLASS_MAP[pred_idx], probabilities, ctx.segmentation, float(np.max(probabilities)))
+    return verdict, prediction
+
+
+def get_gate_stats():
+    """Counters of the module-wide validation cascade (see GateCascade.stats)."""
+    return _gate_cascade.stats()
+
+
+def get_metrics():
+    """Per-stage latency percentiles and counters (see Metrics.snapshot)."""
+    return metrics.snapshot()
+
+
+def open_image(source):
+    """
+    Open an image given as a PIL Image, a file path or raw encoded bytes.
+
+    Args:
+        source: PIL Image, path (str / os.PathLike) or bytes-like object
+
+    Returns:
+        PIL Image
+    """
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    if isinstance(source, (str, os.PathLike)):
+        return Image.open(source)
+    raise TypeError(f"Unsupported image source type: {type(source).__name__}")
+
+
+def prediction_dict(probabilities, segmentation=None, model_version=None):
+    """Result dict (pred_class, probabilities, confidence, segmentation, model_version) of one image."""
+    pred_idx = int(np.argmax(probabilities))
+    return {
+        "pred_class": CLASS_MAP[pred_idx],
+        "probabilities": probabilities,
+        "confidence": float(np.max(probabilities)),
+        "segmentation": segmentation,
+        "model_version": model_version,
+    }
+
+
+def predict_images(images, batch_size=32, return_segmentation=False, model_name=None):
+    """
+    Batch prediction pipeline.
+
+    Feature vectors of each batch are stacked into one matrix so the model
+    is called once per batch instead of once per image.
+
+    Args:
+        images: Iterable of PIL Images, file paths or raw image bytes (mixed allowed)
+        batch_size: Number of images scored per ``predict_proba`` call
+        return_segmentation: Include the Otsu mask of every image in the result
+        model_name: Registered model to use (default: the default model)
+
+    Returns:
+        list of dict, one per input image (same order), with keys
+        ``pred_class``, ``probabilities``, ``confidence``,
+        ``segmentation`` (None unless return_segmentation=True) and
+        ``model_version``
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+
+    results = []
+    batch_features = []
+    batch_masks = []
+    # Semua gambar dalam satu panggilan memakai versi model yang sama
+    entry = _registry.get(model_name)
+    size = _feature_size(entry)
+
+    def flush():
+        probabilities, version = score_features(np.stack(batch_features), entry=entry)
+        for probs, mask in zip(probabilities, batch_masks):
+            results.append(prediction_dict(probs, mask, version))
+        batch_features.clear()
+        batch_masks.clear()
+
+    for source in images:
+        pil_image = open_image(source)
+        metrics.inc("images")
+        # Cache hit: decode, preprocessing dan ekstraksi dilewati
+        features, data = (None, None) if return_segmentation else \
+            _cached_features(pil_image, (size, size), entry)
+        segmentation = None
+        if features is None:
+            gray = _preprocess(pil_image, (size, size)).gray
+            segmentation = _segment(gray) if return_segmentation else None
+            features = _extract_features(pil_image, gray, segmentation, entry, data)
+        batch_masks.append(segmentation)
+        batch_features.append(features)
+
+        if len(batch_features) >= batch_size:
+            flush()
+
+    if batch_features:
+        flush()
+
+    return results
+
+
+def prepare_features(source, cascade=None, model_name=None, entry=None):
+    """
+    Open an image, run the validation cascade and extract its features.
+
+    Args:
+        source: PIL Image, file path or raw image bytes
+        cascade: GateCascade to use (default: the module-wide cascade)
+        model_name: Registered model whose feature mode is used (default: the default model)
+        entry: ModelVersion whose feature mode is used (takes precedence over
+            model_name); pass the same one to score_features
+
+    Returns:
+        tuple: (verdict, features) where features is None if a gate rejected the image
+    """
+    cascade = cascade or _gate_cascade
+    entry = entry or _registry.get(model_name)
+    size = _feature_size(entry)
+    pil_image = open_image(source)
+    ctx = ValidationContext(pil_image, target_size=(size, size))
+    verdict = _run_gates(cascade, ctx)
+    if not verdict.passed:
+        return verdict, None
+    return verdict, _extract_features(pil_image, ctx.gray, ctx.segmentation, entry)
+
+
+def predict_proba_batch(features, model_name=None):
+    """
+    Score a stack of feature vectors with one model call.
+
+    Args:
+        features: Sequence of 313-dim vectors or a (n, 313) matrix
+        model_name: Registered model to use (default: the default model)
+
+    Returns:
+        np.ndarray of shape (n, n_classes)
+    """
+    return score_features(np.stack(features), model_name)[0]
+
+
+def predict_images_gated(images, batch_size=32, cascade=None, model_name=None):
+    """
+    Batch prediction with the validation cascade.
+
+    Every image goes through the gates first; only accepted images are
+    featurized and scored, one ``predict_proba`` call per batch.
+
+    Args:
+        images: Iterable of PIL Images, file paths or raw image bytes
+        batch_size: Number of accepted images scored per model call
+        cascade: GateCascade to use (default: the module-wide cascade)
+        model_name: Registered model to use (default: the default model)
+
+    Returns:
+        list of (verdict, prediction) tuples in input order, where prediction
+        is a dict like the entries of predict_images, or None if rejected
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be >= 1")
+
+    results = []
+    pending = []
+    entry = _registry.get(model_name)
+
+    def flush():
+        probabilities, version = score_features(np.stack([feat for _, feat in pending]), entry=entry)
+        for (i, _), probs in zip(pending, probabilities):
+            results[i] = (results[i][0], prediction_dict(probs, model_version=version))
+        pending.clear()
+
+    for source in images:
+        verdict, features = prepare_features(source, cascade, entry=entry)
+        results.append((verdict, None))
+
+        if features is not None:
+            pending.append((len(results) - 1, features))
+            if len(pending) >= batch_size:
+                flush()
+
+    if pending:
+        flush()
+
+    return results
+
+
 def get_class_names():
     """Return list of class names."""
     return CLASS_MAP.copy()
@@ -6,13 +6,114 @@ This module contains functions for image preprocessing including:
 - BGR to RGB conversion
 - Normalization to [0, 1]
 - Grayscale conversion
+
+Large JPEG uploads are downscaled while decoding (PIL draft mode), so a
+12-megapixel photo is never fully decoded just to be resized to 256x256.
+A PIL Image passed in by the caller is never modified: draft mode is
+applied to a second image opened from the same file or stream.
+
+The preprocessing functions return a PreprocessResult. Grayscale is
+computed straight from the uint8 resize; the float32 normalized RGB is
+only computed when it is accessed. Output arrays can be reused between
+calls through PreprocessBuffers.
 """
 
+import io
+import os
+from functools import cached_property
+
 import cv2
 import numpy as np
+from PIL import Image
+
+# Hasil decode minimal sebesar oversample x ukuran target, agar resize akhir
+# (cv2.resize) tetap mengerjakan sebagian penyusutan seperti saat training
+DRAFT_OVERSAMPLE = 2
+
+# Grayscale training dihitung dari (rgb / 255 * 255).astype(uint8).
+# LUT 256 entri dari round-trip tersebut; untuk float32 hasilnya identitas,
+# sehingga gray dapat dihitung langsung dari hasil resize uint8
+_ROUND_TRIP_LUT = ((np.arange(256, dtype=np.uint8).astype("float32") / 255.0) * 255).astype("uint8")
+_ROUND_TRIP_IS_IDENTITY = bool(np.array_equal(_ROUND_TRIP_LUT, np.arange(256)))
+
+
+class PreprocessBuffers:
+    """
+    Reusable output arrays for repeated preprocessing at one target size.
+
+    Results produced with the same buffers share memory: the next call
+    overwrites the arrays of the previous result.
+
+    Args:
+        target_size: Target size tuple (width, height)
+    """
+
+    def __init__(self, target_size=(256, 256)):
+        width, height = target_size
+        self.target_size = target_size
+        self.resized = np.empty((height, width, 3), dtype=np.uint8)
+        self.rgb = np.empty((height, width, 3), dtype=np.uint8)
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.rgb_norm = np.empty((height, width, 3), dtype=np.float32)
+
 
+class PreprocessResult:
+    """
+    Preprocessed image: resized uint8 RGB, grayscale and lazy normalized RGB.
+
+    Unpacks like the former ``(img_rgb_norm, gray)`` tuple; unpacking
+    computes ``rgb_norm``, so use ``result.gray`` when only grayscale is needed.
 
-def preprocess_image(img, target_size=(256, 256)):
+    Attributes:
+        gray: Grayscale image (uint8, range [0, 255])
+    """
+
+    def __init__(self, resized, gray, bgr=False, buffers=None):
+        self._resized = resized
+        self._bgr = bgr
+        self._buffers = buffers
+        self.gray = gray
+
+    @cached_property
+    def rgb(self):
+        """Resized RGB image (uint8)."""
+        if not self._bgr:
+            return self._resized
+        dst = self._buffers.rgb if self._buffers is not None else None
+        return cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=dst)
+
+    @cached_property
+    def rgb_norm(self):
+        """Normalized RGB image (float32, range [0, 1]), computed on first access."""
+        out = self._buffers.rgb_norm if self._buffers is not None else None
+        return np.divide(self.rgb, np.float32(255.0), out=out, dtype=np.float32)
+
+    def __iter__(self):
+        yield self.rgb_norm
+        yield self.gray
+
+    def __getitem__(self, index):
+        if index in (1, -1):
+            return self.gray
+        return (self.rgb_norm, self.gray)[index]
+
+    def __len__(self):
+        return 2
+
+
+def _preprocess_uint8(img, target_size, bgr, buffers):
+    if buffers is not None and tuple(buffers.target_size) != tuple(target_size):
+        raise ValueError(f"Buffers are for {buffers.target_size}, not {target_size}")
+
+    resized = cv2.resize(img, target_size, dst=buffers.resized if buffers is not None else None)
+    if not _ROUND_TRIP_IS_IDENTITY:
+        resized = cv2.LUT(resized, _ROUND_TRIP_LUT)
+    code = cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY
+    gray = cv2.cvtColor(resized, code, dst=buffers.gray if buffers is not None else None)
+    return PreprocessResult(resized, gray, bgr, buffers)
+
+
+def preprocess_image(img, target_size=(256, 256), buffers=None):
     """
     Preprocessing citra daun jagung.
 
@@ -25,40 +126,121 @@ def preprocess_image(img, target_size=(256, 256)):
     Args:
         img: Input image in BGR format (from cv2.imread or similar)
         target_size: Target size tuple (width, height)
+        buffers: Optional PreprocessBuffers to write the outputs into
 
     Returns:
-        tuple: (img_rgb_norm, gray)
-            - img_rgb_norm: Normalized RGB image (float32, range [0, 1])
+        PreprocessResult, unpackable as (img_rgb_norm, gray)
+            - img_rgb_norm: Normalized RGB image (float32, range [0, 1]), lazy
             - gray: Grayscale image (uint8, range [0, 255])
     """
-    img_resized = cv2.resize(img, target_size)
-    img_rgb = cv2.cvtColor(img_resized, cv2.COLOR_BGR2RGB)
-    img_rgb_norm = img_rgb.astype("float32") / 255.0
-    gray = cv2.cvtColor((img_rgb_norm * 255).astype("uint8"), cv2.COLOR_RGB2GRAY)
-    return img_rgb_norm, gray
+    return _preprocess_uint8(img, target_size, True, buffers)
 
 
-def preprocess_pil_image(pil_image, target_size=(256, 256)):
+def preprocess_rgb_image(img_rgb, target_size=(256, 256), buffers=None):
+    """
+    Preprocessing citra RGB (numpy array) daun jagung.
+
+    Args:
+        img_rgb: RGB image (uint8 numpy array)
+        target_size: Target size tuple (width, height)
+        buffers: Optional PreprocessBuffers to write the outputs into
+
+    Returns:
+        PreprocessResult, unpackable as (img_rgb_norm, gray)
+    """
+    return _preprocess_uint8(img_rgb, target_size, False, buffers)
+
+
+def load_rgb(source, target_size=None, oversample=DRAFT_OVERSAMPLE):
+    """
+    Decode an image to an RGB uint8 array, downscaling at decode time.
+
+    JPEG images that are not decoded yet are read in PIL draft mode at the
+    smallest DCT scale (1/2, 1/4 or 1/8) that keeps both sides at least
+    ``oversample`` times the target size. Smaller images (such as the
+    training photos) are decoded at full resolution, so their result is
+    unchanged. A PIL Image argument is left as it is (draft mode is
+    applied to a copy re-opened from its file or stream).
+
+    Args:
+        source: PIL Image, file path, encoded bytes or RGB uint8 array
+            (arrays are returned as-is, without a copy)
+        target_size: Final size (width, height) after preprocessing;
+            None decodes at full resolution
+        oversample: Minimum decoded size relative to target_size
+
+    Returns:
+        np.ndarray: RGB image (uint8, H x W x 3)
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = Image.open(io.BytesIO(source))
+    elif isinstance(source, (str, os.PathLike)):
+        source = Image.open(source)
+    elif target_size is not None and source.format == "JPEG" and source.tile:
+        # draft() mengubah gambar di tempat: jangan ubah gambar milik pemanggil
+        source = _reopen(source)
+
+    if target_size is not None and source.format == "JPEG":
+        # draft() hanya berlaku sebelum gambar di-decode; jika sudah, diabaikan
+        source.draft("RGB", (target_size[0] * oversample, target_size[1] * oversample))
+
+    if source.mode != "RGB":
+        source = source.convert("RGB")
+    return np.asarray(source)
+
+
+def encoded_bytes(image):
+    """
+    Encoded file bytes of a PIL Image opened from a file or stream.
+
+    Reading them does not decode the image, and the stream position is
+    restored.
+
+    Returns:
+        bytes, or None for an image created in memory (or whose stream is closed)
+    """
+    filename = getattr(image, "filename", None)
+    if filename:
+        try:
+            with open(filename, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+    fp = getattr(image, "fp", None)
+    if fp is None or getattr(fp, "closed", False):
+        return None
+    position = fp.tell()
+    fp.seek(0)
+    data = fp.read()
+    fp.seek(position)
+    return data
+
+
+def _reopen(image):
+    """Second, not yet decoded Image of the same file or stream (the image itself if neither is known)."""
+    if getattr(image, "filename", None):
+        return Image.open(image.filename)
+    data = encoded_bytes(image)
+    if data is None:
+        return image
+    return Image.open(io.BytesIO(data))
+
+
+def preprocess_pil_image(pil_image, target_size=(256, 256), buffers=None):
     """
     Preprocessing PIL Image daun jagung.
 
     Args:
-        pil_image: PIL Image object
+        pil_image: PIL Image object (file path, bytes or RGB array also accepted)
         target_size: Target size tuple (width, height)
+        buffers: Optional PreprocessBuffers to write the outputs into
 
     Returns:
-        tuple: (img_rgb_norm, gray)
+        PreprocessResult, unpackable as (img_rgb_norm, gray)
     """
-    # Convert PIL to numpy array (RGB format)
-    img_rgb = np.array(pil_image.convert("RGB"))
-    
-    # Resize
-    img_resized = cv2.resize(img_rgb, target_size)
-    
-    # Normalize
-    img_rgb_norm = img_resized.astype("float32") / 255.0
-    
-    # Convert to grayscale
-    gray = cv2.cvtColor((img_rgb_norm * 255).astype("uint8"), cv2.COLOR_RGB2GRAY)
-    
-    return img_rgb_norm, gray
+    # Decode ke numpy array RGB, diperkecil saat decode untuk JPEG besar
+    img_rgb = load_rgb(pil_image, target_size)
+
+    return preprocess_rgb_image(img_rgb, target_size, buffers)
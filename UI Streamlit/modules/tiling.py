@@ -0,0 +1,209 @@
+"""
+Tiled high-resolution inference helpers.
+
+A large photo is covered by overlapping TILE_SIZE x TILE_SIZE tiles at its
+native resolution instead of being shrunk to 256x256 as a whole, so a
+small lesion or one of several leaves keeps its detail. Background tiles
+are skipped before feature extraction: the Otsu leaf mask and the HSV
+green mask are computed once on a reduced copy of the frame, and the
+leaf/green share of every tile is read from their integral images in
+O(1) per tile.
+
+The pipeline (``pipeline.predict_image_tiled``) extracts the features of
+the remaining tiles, scores them with one model call and aggregates them
+with ``aggregate_tiles``.
+"""
+
+import cv2
+import numpy as np
+
+from .feature_extraction import leaf_mask
+from .integral_features import window_sums
+from .segmentation import segment_otsu
+from .utils import CLASS_MAP
+from .validation import GREEN_LOWER, GREEN_UPPER, is_prediction_confident
+
+TILE_SIZE = 256
+TILE_OVERLAP = 0.25
+
+# Foto yang lebih besar dari ini diperkecil dulu (4K masih muat)
+MAX_SIDE = 4096
+
+# Gate tile: porsi piksel daun (Otsu) dan hijau minimum agar tile dinilai.
+# Ambang hijau lebih rendah dari validasi seluruh gambar karena tile
+# bergejala penyakit sebagian besar berwarna coklat
+MIN_TILE_LEAF_RATIO = 0.25
+MIN_TILE_GREEN_RATIO = 0.05
+
+# Sisi tile pada salinan kecil yang dipakai gate
+GATE_TILE_SIDE = 32
+
+# Kelas penyakit menang bila menguasai minimal porsi ini dari tile yang yakin
+DISEASE_TILE_SHARE = 0.15
+HEALTHY_CLASS = "Daun Sehat"
+
+
+def tile_origins(length, tile=TILE_SIZE, stride=None, align=1):
+    """
+    Start offsets of the tiles along one axis.
+
+    Tiles step by ``stride`` and the last tile is aligned to the far edge,
+    so the whole axis is covered.
+
+    Args:
+        length: Axis length in pixels (>= tile)
+        tile: Tile side
+        stride: Step between tiles (default: tile * (1 - TILE_OVERLAP))
+        align: Every offset is a multiple of this (e.g. the cell size of
+            ``integral_features``); the last tile then stops up to
+            ``align - 1`` pixels before the far edge
+
+    Returns:
+        np.ndarray of int offsets
+    """
+    if stride is None:
+        stride = max(1, int(round(tile * (1 - TILE_OVERLAP))))
+    stride = max(align, stride // align * align)
+    last = (length - tile) // align * align
+    origins = list(range(0, last + 1, stride))
+    if origins[-1] != last:
+        origins.append(last)
+    return np.array(origins, dtype=np.intp)
+
+
+def fit_frame(img_rgb, tile=TILE_SIZE, max_side=MAX_SIDE):
+    """
+    Resize a frame so that it holds at least one tile and at most ``max_side`` pixels per side.
+
+    Returns:
+        RGB image (the input itself when no resize is needed)
+    """
+    h, w = img_rgb.shape[:2]
+    scale = 1.0
+    if max_side is not None and max(h, w) > max_side:
+        scale = max_side / max(h, w)
+    if min(h, w) * scale < tile:
+        scale = tile / min(h, w)
+    if scale == 1.0:
+        return img_rgb
+    size = (max(tile, int(round(w * scale))), max(tile, int(round(h * scale))))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(img_rgb, size, interpolation=interpolation)
+
+
+def tile_coverage(img_rgb, ys, xs, tile=TILE_SIZE):
+    """
+    Leaf (Otsu) and green (HSV) share of every tile.
+
+    Both masks are computed once on a copy reduced so a tile spans about
+    GATE_TILE_SIDE pixels; the share of each tile comes from the integral
+    image of the mask.
+
+    Args:
+        img_rgb: Frame (RGB uint8)
+        ys, xs: Tile origins (see tile_origins)
+        tile: Tile side
+
+    Returns:
+        tuple: (leaf_ratio, green_ratio), float arrays of shape (len(ys), len(xs))
+    """
+    h, w = img_rgb.shape[:2]
+    scale = min(1.0, GATE_TILE_SIDE / tile)
+    small = cv2.resize(img_rgb, (max(1, int(round(w * scale))), max(1, int(round(h * scale)))),
+                       interpolation=cv2.INTER_AREA) if scale < 1.0 else img_rgb
+
+    gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    leaf = leaf_mask(segment_otsu(gray)).view(np.uint8)
+    green = cv2.inRange(cv2.cvtColor(small, cv2.COLOR_RGB2HSV), GREEN_LOWER, GREEN_UPPER) // 255
+
+    sh, sw = gray.shape
+    y0 = np.minimum((ys * scale).round().astype(np.intp), sh - 1)
+    x0 = np.minimum((xs * scale).round().astype(np.intp), sw - 1)
+    y1 = np.clip(((ys + tile) * scale).round().astype(np.intp), y0 + 1, sh)
+    x1 = np.clip(((xs + tile) * scale).round().astype(np.intp), x0 + 1, sw)
+    area = np.outer(y1 - y0, x1 - x0)
+
+    # Indeks kolom/baris: jumlah semua kombinasi (rows x cols) sekaligus
+    y0, x0 = np.ix_(y0, x0)
+    y1, x1 = np.ix_(y1, x1)
+    leaf_ratio = window_sums(cv2.integral(leaf), y0, y1, x0, x1) / area
+    green_ratio = window_sums(cv2.integral(green), y0, y1, x0, x1) / area
+    return leaf_ratio, green_ratio
+
+
+def tile_gate(leaf_ratio, green_ratio):
+    """Boolean grid of the tiles that are scored (not background)."""
+    return (leaf_ratio >= MIN_TILE_LEAF_RATIO) & (green_ratio >= MIN_TILE_GREEN_RATIO)
+
+
+def aggregate_tiles(probabilities, weights):
+    """
+    Aggregated verdict of the scored tiles.
+
+    Every tile whose prediction is confident (``is_prediction_confident``)
+    votes for its top-1 class with its leaf share as weight. A disease
+    class that holds at least DISEASE_TILE_SHARE of the vote wins over
+    "Daun Sehat", so a lesion confined to one part of the frame is still
+    reported; otherwise the class with the largest vote wins. Without any
+    confident tile the leaf-weighted mean probabilities decide.
+
+    Args:
+        probabilities: (n_tiles, n_classes) tile probabilities
+        weights: (n_tiles,) leaf share of every tile
+
+    Returns:
+        tuple: (pred_idx, mean_probabilities, vote_share)
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    mean = np.average(probabilities, axis=0, weights=weights) if weights.sum() > 0 \
+        else probabilities.mean(axis=0)
+
+    votes = np.zeros(probabilities.shape[1])
+    for probs, weight in zip(probabilities, weights):
+        if is_prediction_confident(probs):
+            votes[int(np.argmax(probs))] += weight
+    if votes.sum() == 0:
+        return int(np.argmax(mean)), mean, votes
+
+    share = votes / votes.sum()
+    diseases = [i for i, name in enumerate(CLASS_MAP) if name != HEALTHY_CLASS]
+    top_disease = max(diseases, key=lambda i: share[i])
+    if share[top_disease] >= DISEASE_TILE_SHARE:
+        return top_disease, mean, share
+    return int(np.argmax(share)), mean, share
+
+
+def heatmap_image(result, class_index, scale=0.125):
+    """
+    Per-pixel probability map of one class from a tiled prediction.
+
+    Overlapping tiles are averaged; pixels not covered by any scored tile
+    are NaN.
+
+    Args:
+        result: dict returned by ``pipeline.predict_image_tiled``
+        class_index: Index into CLASS_MAP
+        scale: Output size relative to the tiled frame
+
+    Returns:
+        np.ndarray float32 of shape (round(H * scale), round(W * scale))
+    """
+    height, width = result["frame_size"][1], result["frame_size"][0]
+    out_h, out_w = max(1, int(round(height * scale))), max(1, int(round(width * scale)))
+    total = np.zeros((out_h, out_w), dtype=np.float32)
+    count = np.zeros((out_h, out_w), dtype=np.float32)
+    tile = result["tile_size"]
+
+    heatmap = result["heatmap"][..., class_index]
+    for i, y in enumerate(result["tile_rows"]):
+        for j, x in enumerate(result["tile_cols"]):
+            value = heatmap[i, j]
+            if np.isnan(value):
+                continue
+            ys = slice(int(round(y * scale)), int(round((y + tile) * scale)))
+            xs = slice(int(round(x * scale)), int(round((x + tile) * scale)))
+            total[ys, xs] += value
+            count[ys, xs] += 1
+
+    with np.errstate(invalid="ignore"):
+        return np.where(count > 0, total / count, np.nan).astype(np.float32)
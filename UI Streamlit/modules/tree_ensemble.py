@@ -0,0 +1,191 @@
+"""
+Pure-NumPy evaluator for the trained XGBoost tree ensemble.
+
+For single-image requests the XGBoost predictor setup costs more than the
+trees themselves. TreeEnsemble flattens every tree of the booster into
+contiguous NumPy arrays (split feature, threshold, left/right child,
+default direction, leaf value) and evaluates all trees for a whole batch
+at once: every row walks all trees in lockstep, one level per step.
+Leaves point to themselves, so rows that reach a leaf early simply stay
+there. Leaf values are summed per class and passed through the
+multi-class softmax, matching ``predict_proba`` to within 1e-6.
+
+Example:
+    ensemble = TreeEnsemble.from_model(load_model())
+    probabilities = ensemble.predict_proba(features)
+"""
+
+import json
+
+import numpy as np
+
+
+class TreeEnsemble:
+    """
+    Flattened multi-class gradient boosted tree ensemble.
+
+    Node arrays are indexed globally across trees; ``roots`` holds the
+    index of every tree's root node and ``tree_class`` the class each tree
+    contributes to. Build it with ``from_booster`` / ``from_model``.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, value,
+                 roots, tree_class, base_score, max_depth, n_features, feature_mode="full",
+                 feature_size=256):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.n_classes = len(base_score)
+        self.base_score = base_score
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+        self.feature_mode = feature_mode
+        self.feature_size = feature_size
+
+        # children[2 * node + go_left]: anak kanan/kiri berselang-seling
+        self.children = np.stack([right, left], axis=1).ravel()
+
+        # One-hot (n_trees, n_classes): jumlah nilai leaf per kelas lewat satu matmul
+        self.class_matrix = np.zeros((len(roots), self.n_classes), dtype=np.float64)
+        self.class_matrix[np.arange(len(roots)), tree_class] = 1.0
+
+    @classmethod
+    def from_booster(cls, booster):
+        """
+        Flatten an ``xgboost.Booster`` (gbtree, multi:softprob).
+
+        Raises:
+            ValueError: unsupported booster, objective or categorical splits
+        """
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        gbm = learner["gradient_booster"]
+        if gbm["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster: {gbm['name']}")
+        objective = learner["objective"]["name"]
+        if objective != "multi:softprob":
+            raise ValueError(f"Unsupported objective: {objective}")
+
+        trees = gbm["model"]["trees"]
+        tree_info = gbm["model"]["tree_info"]
+
+        # predict_proba pada XGBClassifier hanya memakai pohon sampai best_iteration
+        best_iteration = booster.attr("best_iteration")
+        if best_iteration is not None:
+            n_used = gbm["model"]["iteration_indptr"][int(best_iteration) + 1]
+            trees, tree_info = trees[:n_used], tree_info[:n_used]
+
+        params = learner["learner_model_param"]
+        base_score = np.array(
+            [float(v) for v in params["base_score"].strip("[]").split(",")], dtype=np.float64
+        )
+        n_classes = int(params["num_class"])
+        if len(base_score) == 1:
+            base_score = np.repeat(base_score, n_classes)
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported")
+
+            tree_left = np.asarray(tree["left_children"], dtype=np.int64)
+            tree_right = np.asarray(tree["right_children"], dtype=np.int64)
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            is_leaf = tree_left == -1
+            own = np.arange(len(tree_left), dtype=np.int64)
+
+            # Leaf menunjuk ke dirinya sendiri
+            left.append(np.where(is_leaf, own, tree_left) + offset)
+            right.append(np.where(is_leaf, own, tree_right) + offset)
+            feature.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int64))
+            threshold.append(conditions)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            value.append(np.where(is_leaf, conditions, 0.0).astype(np.float32))
+            roots.append(offset)
+
+            max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+            offset += len(tree_left)
+
+        return cls(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left),
+            right=np.concatenate(right),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value),
+            roots=np.asarray(roots, dtype=np.int64),
+            tree_class=np.asarray(tree_info, dtype=np.int64),
+            base_score=base_score,
+            max_depth=max_depth,
+            n_features=int(params["num_feature"]),
+            feature_mode=booster.attr("feature_mode") or "full",
+            feature_size=int(booster.attr("feature_size") or 256),
+        )
+
+    @classmethod
+    def from_model(cls, model):
+        """Flatten an XGBClassifier, a NativeModel or a Booster."""
+        if hasattr(model, "get_booster"):
+            return cls.from_booster(model.get_booster())
+        if hasattr(model, "booster"):
+            return cls.from_booster(model.booster)
+        return cls.from_booster(model)
+
+    def _leaves(self, X):
+        n, n_features = X.shape
+        nodes = np.tile(self.roots, (n, 1))
+        row_offset = (np.arange(n, dtype=np.int64) * n_features)[:, None]
+        flat = X.ravel()
+        has_nan = np.isnan(flat).any()
+
+        for _ in range(self.max_depth):
+            x = np.take(flat, row_offset + np.take(self.feature, nodes))
+            go_left = x < np.take(self.threshold, nodes)
+            if has_nan:
+                go_left |= np.isnan(x) & np.take(self.default_left, nodes)
+            nodes = np.take(self.children, 2 * nodes + go_left)
+        return nodes
+
+    def predict_margin(self, features):
+        """
+        Raw per-class scores (base score + sum of leaf values).
+
+        Returns:
+            np.ndarray of shape (n, n_classes), float64
+        """
+        X = np.ascontiguousarray(features, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+
+        leaf_values = self.value[self._leaves(X)].astype(np.float64)
+        return leaf_values @ self.class_matrix + self.base_score
+
+    def predict_proba(self, features):
+        """
+        Class probabilities (softmax of the margins).
+
+        Returns:
+            np.ndarray of shape (n, n_classes), float32
+        """
+        margin = self.predict_margin(features)
+        margin -= margin.max(axis=1, keepdims=True)
+        exp = np.exp(margin)
+        return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def _tree_depth(left, right):
+    depth = 0
+    level = [0]
+    while True:
+        children = [c for n in level for c in (left[n], right[n]) if c != -1]
+        if not children:
+            return depth
+        depth += 1
+        level = children
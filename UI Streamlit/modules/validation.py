@@ -0,0 +1,333 @@
+"""
+Input validation module for corn leaf disease classification.
+
+All validation checks of the Streamlit app are computed from one decoded,
+downsampled copy of the upload:
+- green ratio: share of pixels inside the HSV green range
+- entropy: Shannon entropy of the grayscale histogram
+- area ratio: share of leaf pixels in the Otsu segmentation
+- gray-on-leaf ratio: share of low-saturation pixels on the leaf
+
+The RGB, HSV and grayscale buffers are computed once and shared between
+the checks. The result is a structured verdict with the measured value,
+the outcome and the time spent for every check.
+
+The checks are run as a cascade of gates ordered by their declared cost.
+The first failing gate stops the cascade, so rejected uploads never reach
+the expensive feature extraction. Counters of evaluated, rejected and
+skipped stages show how much work the gates save.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from functools import cached_property
+
+import cv2
+import numpy as np
+
+from .preprocessing import load_rgb, preprocess_rgb_image
+from .segmentation import segment_otsu
+
+# ==============================
+# PARAMETER VALIDASI (FINAL)
+# ==============================
+MIN_AREA_RATIO = 0.05
+MIN_GREEN_RATIO = 0.15
+MIN_ENTROPY = 3.0
+MAX_ENTROPY = 8.8
+MAX_GRAY_RATIO_ON_LEAF = 0.85
+CONF_THRESHOLD = 0.55
+MIN_CONF_MARGIN = 0.10
+
+GREEN_LOWER = np.array([25, 40, 40])
+GREEN_UPPER = np.array([95, 255, 255])
+MAX_LEAF_SATURATION = 30
+
+# Ukuran kerja validasi (sama dengan ukuran segmentasi pipeline)
+VALIDATION_SIZE = (256, 256)
+
+REJECTION_MESSAGES = {
+    "green": "❌ Objek tidak dikenali (warna hijau tidak dominan)",
+    "texture": "❌ Tekstur tidak menyerupai daun alami",
+    "segmentation": "❌ Segmentasi daun gagal",
+    "leaf_color": "❌ Daun terlalu pucat / rusak parah",
+}
+
+CheckResult = namedtuple("CheckResult", ["name", "passed", "value", "seconds"])
+
+# cost: perkiraan biaya relatif; gate dijalankan dari yang termurah
+Gate = namedtuple("Gate", ["name", "cost", "measure", "accept"])
+
+# Nama tahap setelah semua gate lolos (ekstraksi fitur + model)
+CLASSIFIER_STAGE = "classifier"
+
+
+class ValidationVerdict:
+    """
+    Outcome of a gate cascade.
+
+    Attributes:
+        checks: dict name -> CheckResult of the gates that were evaluated, in run order
+        skipped: Names of the gates not evaluated because an earlier gate failed
+    """
+
+    def __init__(self, checks, skipped=()):
+        self.checks = checks
+        self.skipped = tuple(skipped)
+
+    @property
+    def passed(self):
+        return all(c.passed for c in self.checks.values())
+
+    @property
+    def failed_check(self):
+        """Name of the first failing check, or None."""
+        for c in self.checks.values():
+            if not c.passed:
+                return c.name
+        return None
+
+    @property
+    def message(self):
+        """Rejection message of the first failing check, or None."""
+        name = self.failed_check
+        return REJECTION_MESSAGES.get(name) if name else None
+
+    @property
+    def total_seconds(self):
+        return sum(c.seconds for c in self.checks.values())
+
+    def to_dict(self):
+        return {
+            "passed": self.passed,
+            "failed_check": self.failed_check,
+            "skipped": list(self.skipped),
+            "checks": {
+                name: {"passed": c.passed, "value": float(c.value), "seconds": c.seconds}
+                for name, c in self.checks.items()
+            },
+        }
+
+
+class ImageBuffers:
+    """
+    Shared buffers of one validated image.
+
+    The upload is downsampled once; HSV, grayscale and the grayscale
+    histogram are derived from that single RGB buffer.
+    """
+
+    def __init__(self, img_rgb, size=VALIDATION_SIZE):
+        rgb = img_rgb
+        if rgb.shape[1] != size[0] or rgb.shape[0] != size[1]:
+            rgb = cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+        self.rgb = rgb
+        self.hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+        self.gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        self.gray_hist = np.bincount(self.gray.ravel(), minlength=256)
+
+
+class ValidationContext:
+    """
+    Lazily computed intermediates shared by the gates and the classifier.
+
+    Each intermediate is computed the first time a gate (or the pipeline)
+    needs it, so a gate that rejects early never pays for later stages.
+
+    Args:
+        image: PIL Image (upload)
+        segmentation: Precomputed Otsu mask (optional)
+        size: Working size (width, height) of the validation buffers
+        target_size: Preprocessing target size of the pipeline
+    """
+
+    def __init__(self, image, segmentation=None, size=VALIDATION_SIZE, target_size=(256, 256)):
+        self.image = image
+        self.size = size
+        self.target_size = target_size
+        if segmentation is not None:
+            self.segmentation = segmentation
+
+    @cached_property
+    def rgb(self):
+        """RGB decode of the upload (done once, JPEGs downscaled while decoding)."""
+        decode_size = (max(self.size[0], self.target_size[0]), max(self.size[1], self.target_size[1]))
+        return load_rgb(self.image, decode_size)
+
+    @cached_property
+    def buffers(self):
+        return ImageBuffers(self.rgb, self.size)
+
+    @cached_property
+    def gray(self):
+        """Pipeline grayscale image (same preprocessing as training)."""
+        return preprocess_rgb_image(self.rgb, self.target_size).gray
+
+    @cached_property
+    def segmentation(self):
+        return segment_otsu(self.gray)
+
+    @cached_property
+    def validation_segmentation(self):
+        return _match_size(self.segmentation, self.size)
+
+
+def green_ratio(buffers):
+    """Share of pixels inside the HSV green range."""
+    mask = cv2.inRange(buffers.hsv, GREEN_LOWER, GREEN_UPPER)
+    return cv2.countNonZero(mask) / mask.size
+
+
+def gray_entropy(buffers):
+    """Shannon entropy (bits) of the grayscale histogram."""
+    counts = buffers.gray_hist[buffers.gray_hist > 0]
+    p = counts / counts.sum()
+    return float(-np.sum(p * np.log2(p)))
+
+
+def leaf_area_ratio(segmentation):
+    """Share of leaf (non-zero) pixels in the segmentation."""
+    return cv2.countNonZero(segmentation) / segmentation.size
+
+
+def gray_ratio_on_leaf(buffers, segmentation):
+    """Share of low-saturation pixels on the leaf; 1.0 when there is no leaf."""
+    leaf_mask = segmentation > 0
+    total_leaf_pixels = np.count_nonzero(leaf_mask)
+    if total_leaf_pixels == 0:
+        return 1.0
+
+    low_saturation = buffers.hsv[:, :, 1] < MAX_LEAF_SATURATION
+    return np.count_nonzero(low_saturation & leaf_mask) / total_leaf_pixels
+
+
+def _match_size(segmentation, size):
+    if segmentation.shape[1] != size[0] or segmentation.shape[0] != size[1]:
+        return cv2.resize(segmentation, size, interpolation=cv2.INTER_NEAREST)
+    return segmentation
+
+
+DEFAULT_GATES = (
+    Gate("green", 1.0,
+         lambda ctx: green_ratio(ctx.buffers),
+         lambda v: v >= MIN_GREEN_RATIO),
+    Gate("texture", 1.1,
+         lambda ctx: gray_entropy(ctx.buffers),
+         lambda v: MIN_ENTROPY <= v <= MAX_ENTROPY),
+    Gate("segmentation", 2.0,
+         lambda ctx: leaf_area_ratio(ctx.segmentation),
+         lambda v: v >= MIN_AREA_RATIO),
+    Gate("leaf_color", 2.5,
+         lambda ctx: gray_ratio_on_leaf(ctx.buffers, ctx.validation_segmentation),
+         lambda v: v <= MAX_GRAY_RATIO_ON_LEAF),
+)
+
+
+class GateCascade:
+    """
+    Validation gates run in order of increasing cost.
+
+    Args:
+        gates: Iterable of Gate (sorted by cost; ties keep the given order)
+        short_circuit: Stop at the first failing gate
+
+    The cascade keeps process-wide counters (thread-safe) of how many times
+    each stage was evaluated, rejected the input or was skipped, including
+    the classifier stage that follows the gates.
+    """
+
+    def __init__(self, gates=DEFAULT_GATES, short_circuit=True):
+        self.gates = tuple(sorted(gates, key=lambda g: g.cost))
+        self.short_circuit = short_circuit
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        names = [g.name for g in self.gates] + [CLASSIFIER_STAGE]
+        with self._lock:
+            self._runs = 0
+            self._evaluated = dict.fromkeys(names, 0)
+            self._rejected = dict.fromkeys(names[:-1], 0)
+            self._skipped = dict.fromkeys(names, 0)
+
+    def run(self, ctx):
+        """
+        Evaluate the gates on a ValidationContext.
+
+        Returns:
+            ValidationVerdict
+        """
+        checks = {}
+        skipped = []
+        rejected = False
+        for gate in self.gates:
+            if rejected and self.short_circuit:
+                skipped.append(gate.name)
+                continue
+            t0 = time.perf_counter()
+            value = gate.measure(ctx)
+            passed = bool(gate.accept(value))
+            checks[gate.name] = CheckResult(gate.name, passed, value, time.perf_counter() - t0)
+            rejected = rejected or not passed
+
+        verdict = ValidationVerdict(checks, skipped)
+        self._record(verdict)
+        return verdict
+
+    def _record(self, verdict):
+        with self._lock:
+            self._runs += 1
+            for name, check in verdict.checks.items():
+                self._evaluated[name] += 1
+                if not check.passed:
+                    self._rejected[name] += 1
+            for name in verdict.skipped:
+                self._skipped[name] += 1
+            if verdict.passed:
+                self._evaluated[CLASSIFIER_STAGE] += 1
+            else:
+                self._skipped[CLASSIFIER_STAGE] += 1
+
+    def stats(self):
+        """
+        Snapshot of the cascade counters.
+
+        Returns:
+            dict with ``runs`` and per-stage ``evaluated``, ``rejected`` and
+            ``skipped`` counts (the classifier stage is skipped whenever a
+            gate rejects the input).
+        """
+        with self._lock:
+            return {
+                "runs": self._runs,
+                "evaluated": dict(self._evaluated),
+                "rejected": dict(self._rejected),
+                "skipped": dict(self._skipped),
+            }
+
+
+def is_prediction_confident(probabilities):
+    """Top-1 probability and its margin over the runner-up are high enough."""
+    probs_sorted = np.sort(probabilities)
+    top = probs_sorted[-1]
+    second = probs_sorted[-2]
+    return top >= CONF_THRESHOLD and (top - second) >= MIN_CONF_MARGIN
+
+
+def validate_image(image, segmentation=None, size=VALIDATION_SIZE):
+    """
+    Run every validation check on a single decoded copy of the image.
+
+    Unlike the cascade used by the pipeline, all checks are evaluated.
+
+    Args:
+        image: PIL Image (upload)
+        segmentation: Otsu mask from the pipeline (computed here if None)
+        size: Working size (width, height) of the validation buffers
+
+    Returns:
+        ValidationVerdict
+    """
+    ctx = ValidationContext(image, segmentation, size)
+    return GateCascade(DEFAULT_GATES, short_circuit=False).run(ctx)
@@ -0,0 +1,301 @@
+"""
+HTTP inference service for corn leaf disease classification.
+
+A lightweight stdlib HTTP server around the prediction pipeline, so other
+systems can call the classifier without going through Streamlit.
+
+Endpoints:
+    GET  /healthz        Process is alive
+    GET  /readyz         Model loaded and extractors warmed up (503 otherwise)
+    GET  /stats          Gate counters, per-stage latency percentiles and model versions
+    GET  /metrics        Stage latency histograms and counters (Prometheus text format)
+    POST /predict        Body: raw image bytes, or JSON {"image": "<base64>"}
+    POST /predict/batch  Body: JSON {"images": ["<base64>", ...]}
+    POST /predict/tiled  Body like /predict; large photo scored tile by tile,
+                         returns the aggregated verdict and a per-tile heatmap
+
+Every prediction returns the class, per-class probabilities, confidence,
+the model version that scored it and the same validation verdicts as the
+Streamlit app. A retrained model copied over the artifact in ``model/`` is
+picked up without a restart. Requests beyond
+the concurrency limit (plus a short queue) are answered with 429 instead
+of queueing without bound.
+
+Usage:
+    python server.py --host 0.0.0.0 --port 8000 --max-concurrency 4
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import UnidentifiedImageError
+
+from modules.pipeline import (
+    warm_up, predict_images_gated, predict_image_tiled, get_gate_stats, get_metrics,
+    get_class_names, get_model_versions,
+)
+from modules.metrics import metrics
+from modules.validation import is_prediction_confident
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+MAX_BATCH_IMAGES = 64
+
+
+class InferenceService:
+    """
+    Model lifecycle and admission control of the HTTP service.
+
+    Args:
+        max_concurrency: Number of requests running inference at the same time
+        max_queue: Number of admitted requests allowed to wait for a slot
+    """
+
+    def __init__(self, max_concurrency=2, max_queue=8):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._admission = threading.BoundedSemaphore(max_concurrency + max_queue)
+        self._workers = threading.BoundedSemaphore(max_concurrency)
+        self._ready = threading.Event()
+        self.warmup_seconds = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self):
+        """Load the model once and warm up the extractors on a synthetic leaf."""
+        self.warmup_seconds = warm_up()["seconds"]
+        self._ready.set()
+
+    def try_acquire(self):
+        """Admit a request; False means the service is overloaded (429)."""
+        return self._admission.acquire(blocking=False)
+
+    def release(self):
+        self._admission.release()
+
+    def predict(self, images):
+        """Run the gated batch pipeline under the concurrency limit."""
+        with self._workers:
+            results = predict_images_gated(images)
+        return [format_result(verdict, prediction) for verdict, prediction in results]
+
+    def predict_tiled(self, image):
+        """Run the tiled pipeline on one large photo under the concurrency limit."""
+        with self._workers:
+            return format_tiled_result(predict_image_tiled(image))
+
+
+def format_result(verdict, prediction):
+    """JSON-serializable result of one image."""
+    result = {
+        "accepted": verdict.passed,
+        "message": verdict.message,
+        "validation": verdict.to_dict(),
+        "class": None,
+        "probabilities": None,
+        "confidence": None,
+        "confident": None,
+        "model_version": None,
+    }
+    if prediction is not None:
+        probs = prediction["probabilities"]
+        result.update({
+            "class": prediction["pred_class"],
+            "probabilities": {cls: float(p) for cls, p in zip(get_class_names(), probs)},
+            "confidence": prediction["confidence"],
+            "confident": bool(is_prediction_confident(probs)),
+            "model_version": prediction["model_version"],
+        })
+    return result
+
+
+def format_tiled_result(result):
+    """JSON-serializable result of a tiled prediction (NaN tiles become null)."""
+    heatmap = result["heatmap"]
+    probs = result["probabilities"]
+    return {
+        "class": result["pred_class"],
+        "probabilities": None if probs is None else {
+            cls: float(p) for cls, p in zip(get_class_names(), probs)
+        },
+        "confidence": result["confidence"],
+        "tiles_scored": result["tiles_scored"],
+        "tile_size": result["tile_size"],
+        "frame_size": list(result["frame_size"]),
+        "tile_rows": result["tile_rows"].tolist(),
+        "tile_cols": result["tile_cols"].tolist(),
+        "heatmap": [
+            [None if np.isnan(cell[0]) else [float(p) for p in cell] for cell in row]
+            for row in heatmap
+        ],
+        "model_version": result["model_version"],
+    }
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _decode_base64(value):
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, TypeError, ValueError):
+        raise BadRequest(400, "Invalid base64 image")
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type="text/plain; version=0.0.4"):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            raise BadRequest(400, "Empty request body")
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(413, "Request body too large")
+        return self.rfile.read(length)
+
+    def _read_images(self, batch):
+        body = self._read_body()
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+
+        if content_type == "application/json":
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise BadRequest(400, "Invalid JSON body")
+            if batch:
+                images = payload.get("images") if isinstance(payload, dict) else None
+                if not isinstance(images, list) or not images:
+                    raise BadRequest(400, "Expected a non-empty 'images' list")
+                if len(images) > MAX_BATCH_IMAGES:
+                    raise BadRequest(413, f"At most {MAX_BATCH_IMAGES} images per batch")
+                return [_decode_base64(img) for img in images]
+            image = payload.get("image") if isinstance(payload, dict) else None
+            if not isinstance(image, str):
+                raise BadRequest(400, "Expected an 'image' base64 string")
+            return [_decode_base64(image)]
+
+        if batch:
+            raise BadRequest(415, "Batch requests must be application/json")
+        return [body]
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/readyz":
+            if self.service.ready:
+                self._send_json(200, {"status": "ready", "warmup_seconds": self.service.warmup_seconds})
+            else:
+                self._send_json(503, {"status": "starting"})
+        elif self.path == "/stats":
+            self._send_json(200, {
+                "gates": get_gate_stats(),
+                "metrics": get_metrics(),
+                "models": get_model_versions(),
+            })
+        elif self.path == "/metrics":
+            self._send_text(200, metrics.prometheus_text())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path not in ("/predict", "/predict/batch", "/predict/tiled"):
+            self.close_connection = True
+            self._send_json(404, {"error": "Not found"})
+            return
+        if not self.service.ready:
+            self.close_connection = True
+            self._send_json(503, {"error": "Model is not ready"})
+            return
+        if not self.service.try_acquire():
+            self.close_connection = True
+            self._send_json(429, {"error": "Too many requests"}, {"Retry-After": "1"})
+            return
+
+        try:
+            batch = self.path == "/predict/batch"
+            images = self._read_images(batch)
+            if self.path == "/predict/tiled":
+                status, body = 200, self.service.predict_tiled(images[0])
+            else:
+                results = self.service.predict(images)
+                status, body = 200, {"results": results} if batch else results[0]
+        except BadRequest as e:
+            self.close_connection = True
+            status, body = e.status, {"error": str(e)}
+        except (UnidentifiedImageError, OSError):
+            status, body = 400, {"error": "Cannot decode image"}
+        except Exception as e:
+            # Mis. DecompressionBombError atau mode gambar yang tidak didukung
+            self.close_connection = True
+            status, body = 500, {"error": "Internal server error", "type": type(e).__name__}
+        finally:
+            # Slot dilepas sebelum respons ditulis, agar request berikutnya dari
+            # klien yang sama tidak mendapat 429 palsu
+            self.service.release()
+        self._send_json(status, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8000, max_concurrency=2, max_queue=8):
+    """Create the HTTP server and its InferenceService (not started yet)."""
+    service = InferenceService(max_concurrency, max_queue)
+    handler = type("BoundInferenceHandler", (InferenceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CornShield HTTP inference service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=8)
+    args = parser.parse_args()
+
+    server, service = make_server(args.host, args.port, args.max_concurrency, args.max_queue)
+    # Server sudah menerima /healthz selama warm-up; /readyz 200 setelah siap
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service.start()
+    print(f"Serving on http://{args.host}:{args.port} (warm-up {service.warmup_seconds:.2f}s)")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,7 @@ except ImportError:
     files = None
 
 import os
+import sys
 import numpy as np
 import cv2
 import matplotlib.pyplot as plt
@@ -51,6 +52,9 @@ from sklearn.metrics import accuracy_score, classification_report, confusion_mat
 plt.rcParams['figure.figsize'] = (6, 4)
 plt.rcParams['figure.dpi'] = 120
 
+# Modul bersama aplikasi Streamlit (UI Streamlit/modules)
+sys.path.insert(0, os.path.abspath("UI Streamlit"))
+
 print("Libraries loaded.")
 
 """# EDA"""
@@ -85,13 +89,17 @@ for root, dirs, files_list in os.walk('/content/'):
 print("\n")
 
 base_dir = "archive/data jagung/data jagung train"   
-classes = os.listdir(base_dir)
-class_counts = {}
 
-for c in classes:
-    class_path = os.path.join(base_dir, c)
-    num_files = len(os.listdir(class_path))
-    class_counts[c] = num_files
+# Manifest dataset: setiap gambar di-decode sekali saja untuk mencatat
+# path, label, ukuran file, mtime, dimensi, dan brightness. Hasilnya di-cache
+# ke manifest.csv dan hanya file yang berubah (mtime) yang dibaca ulang.
+from modules.manifest import build_manifest
+
+MANIFEST_PATH = "manifest.csv"
+manifest = build_manifest(base_dir, cache_path=MANIFEST_PATH, n_jobs=os.cpu_count())
+
+classes = sorted(manifest["label"].unique())
+class_counts = manifest["label"].value_counts().to_dict()
 
 class_counts
 
@@ -111,36 +119,13 @@ print("Kelas yang diharapkan:", CLASS_MAP)
 
 import pandas as pd
 
-data = []
-for class_name in classes:
-    folder_path = os.path.join(BASE_DIR, class_name)
-    if os.path.isdir(folder_path):
-        for filename in os.listdir(folder_path):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                filepath = os.path.join(folder_path, filename)
-                data.append({"filepath": filepath, "label": class_name})
-
-df_raw = pd.DataFrame(data)
+df_raw = manifest[["filepath", "label"]]
 
 print(f"\nTotal gambar yang ditemukan: {len(df_raw)}")
 print(f"Distribusi per kelas:\n{df_raw['label'].value_counts()}")
 
 
 import math
-import os
-import pandas as pd
-
-
-data = []
-for class_name in classes:
-    folder_path = os.path.join(BASE_DIR, class_name)
-    if os.path.isdir(folder_path):
-        for filename in os.listdir(folder_path):
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                filepath = os.path.join(folder_path, filename)
-                data.append({"filepath": filepath, "label": class_name})
-
-df_raw = pd.DataFrame(data)
 
 num_samples = 4  
 plt.figure(figsize=(14, 8))
@@ -170,14 +155,6 @@ plt.tight_layout()
 plt.show()
 
 
-classes = os.listdir(base_dir)
-class_counts = {}
-
-for c in classes:
-    class_path = os.path.join(base_dir, c)
-    num_files = len(os.listdir(class_path))
-    class_counts[c] = num_files
-
 print("\nJumlah gambar per kelas:")
 print(class_counts)
 
@@ -205,9 +182,7 @@ plt.show()
 plt.figure(figsize=(12, 8))
 
 for idx, c in enumerate(classes):
-    folder_path = os.path.join(base_dir, c)
-    img_name = os.listdir(folder_path)[0]  
-    img_path = os.path.join(folder_path, img_name)
+    img_path = manifest.loc[manifest["label"] == c, "filepath"].iloc[0]
 
     img = cv2.imread(img_path)
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -221,19 +196,9 @@ plt.suptitle("Contoh Gambar Tiap Kelas", fontsize=16)
 plt.show()
 
 
-sizes = []
-
-for c in classes:
-    folder_path = os.path.join(base_dir, c)
-    for f in os.listdir(folder_path):
-        img_path = os.path.join(folder_path, f)
-        img = cv2.imread(img_path)
-
-        if img is None:
-            continue
-
-        h, w = img.shape[:2]
-        sizes.append((h, w))
+# Dimensi gambar dibaca dari manifest (tanpa decode ulang)
+decoded = manifest.dropna(subset=["height", "width"])
+sizes = list(zip(decoded["height"].astype(int), decoded["width"].astype(int)))
 
 sizes[:5]
 
@@ -258,19 +223,7 @@ plt.ylabel("Frekuensi")
 plt.show()
 
 
-brightness = []
-
-for c in classes:
-    folder_path = os.path.join(base_dir, c)
-    for f in os.listdir(folder_path):
-        img_path = os.path.join(folder_path, f)
-        img = cv2.imread(img_path)
-
-        if img is None:
-            continue
-
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        brightness.append(gray.mean())
+brightness = manifest["brightness"].dropna().tolist()
 
 plt.figure(figsize=(8,5))
 plt.hist(brightness, bins=40, color='purple')
@@ -428,113 +381,85 @@ for folder_name in CLASS_MAP.keys():
 
 
 
-def extract_fine_features(gray, radius=1, neighbors=8, step=2):
-    h, w = gray.shape
-    codes = []
-
-    for y in range(radius, h - radius, step):
-        for x in range(radius, w - radius, step):
-            center = gray[y, x]
-            binary = []
-            for n in range(neighbors):
-                theta = 2 * np.pi * n / neighbors
-                yy = int(round(y + radius * np.sin(theta)))
-                xx = int(round(x + radius * np.cos(theta)))
-                binary.append(1 if gray[yy, xx] >= center else 0)
-
-           
-            rotations = [
-                int("".join(map(str, binary[i:] + binary[:i])), 2)
-                for i in range(neighbors)
-            ]
-            codes.append(min(rotations))
-
-    hist, _ = np.histogram(codes, bins=256, range=(0,256))
-    hist = hist.astype("float32")
-    hist /= (hist.sum() + 1e-8)
-    return hist
-
-
-
-def extract_coarse_features(gray, num_bins=32):
-    sobelx = cv2.Sobel(gray.astype("float32"), cv2.CV_32F, 1, 0, ksize=3)
-    sobely = cv2.Sobel(gray.astype("float32"), cv2.CV_32F, 0, 1, ksize=3)
-    magnitude = np.sqrt(sobelx**2 + sobely**2)
+# Ekstraktor fitur (Fine LBP 256 + Coarse Sobel 32 + DOR 25 = 313 dimensi)
+# diimpor dari modules.feature_extraction, sama persis dengan aplikasi.
 
-    hist, _ = np.histogram(magnitude, bins=num_bins, range=(0, magnitude.max()+1e-8))
-    hist = hist.astype("float32")
-    hist /= (hist.sum() + 1e-8)
-    return hist
-
-
-
-def extract_dor_features(gray, window_size=5):
-    assert window_size % 2 == 1, "window_size harus ganjil"
-
-    pad = window_size // 2
-    padded = np.pad(gray.astype("float32"), pad, mode="reflect")
-    h, w = gray.shape
-    dom_idx = []
-
-    for y in range(h):
-        for x in range(w):
-            region = padded[y:y+window_size, x:x+window_size]
-            center = padded[y+pad, x+pad]
-
-            diffs = np.abs(region - center).flatten()
-            dom_idx.append(np.argmax(diffs))
+# Pipeline
 
-    num_pos = window_size * window_size
-    hist, _ = np.histogram(dom_idx, bins=num_pos, range=(0, num_pos))
-    hist = hist.astype("float32")
-    hist /= (hist.sum() + 1e-8)
-    return hist
 
+from modules.feature_cache import FeatureCache, feature_cache_config
+from modules.feature_extraction import extract_features, thread_buffers
+from modules import preprocessing
 
+# Mode fitur untuk training:
+# - "full": ekstraktor memindai seluruh citra (model asli)
+# - "leaf": citra di-crop ke bounding box mask Otsu dan hanya piksel daun yang dihitung
+# Model yang dihasilkan diekspor dengan mode ini; aplikasi memakai mode yang sama saat inferensi.
+FEATURE_MODE = "full"
 
+# Cache fitur di disk: key = hash(bytes gambar + konfigurasi ekstraktor + versi + mode).
+# Setelah restart notebook, X dibangun ulang dari cache dalam hitungan detik.
+FEATURE_CACHE_DIR = ".feature_cache"
+FEATURE_CACHE = FeatureCache(FEATURE_CACHE_DIR, max_bytes=512 * 1024 * 1024)
+FEATURE_CACHE_CONFIG = feature_cache_config(target_size=(256, 256), mode=FEATURE_MODE)
 
 
-def extract_all_features(gray):
-    fine   = extract_fine_features(gray)
-    coarse = extract_coarse_features(gray)
-    dor    = extract_dor_features(gray)
+def process_image_to_vector(path, mode=FEATURE_MODE, size=256):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
 
-    # Total fitur = 256 + 32 + 25 = 313 dimensi
-    return np.concatenate([fine, coarse, dor]).astype("float32")
+    def compute():
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
 
-# Pipeline
+        # Hanya grayscale yang dibutuhkan; RGB float tidak dibuat
+        gray = preprocessing.preprocess_image(img, (size, size)).gray
+        # Ekstraktor yang sama dengan aplikasi: cache fitur dipakai bersama
+        return extract_features(gray, mode=mode, buffers=thread_buffers())
 
+    config = feature_cache_config(target_size=(size, size), mode=mode)
+    return FEATURE_CACHE.get_or_compute(data, config, compute)
 
-def process_image_to_vector(path):
-    img = cv2.imread(path)
-    if img is None:
-        print("Gagal membaca:", path)
-        return None
 
-    rgb_norm, gray = preprocess_image(img)
-    otsu_mask = segment_otsu(gray)
-    feat_vec = extract_all_features(gray)
+# MEMBANGUN X (FITUR) DAN y (LABEL)
 
-    return feat_vec
 
+from modules.feature_store import FeatureStore
 
-# MEMBANGUN X (FITUR) DAN y (LABEL)
+N_JOBS = os.cpu_count()   # jumlah proses worker
+CHUNK_SIZE = 8            # jumlah gambar per tugas worker
 
+# Feature store di disk: matriks float32 (memmap) + index path/label.
+# Hanya gambar baru atau yang berubah di BASE_DIR/<kelas> yang diekstraksi;
+# baris gambar yang sudah dihapus ikut dibuang.
+FEATURE_STORE_DIR = "feature_store" if FEATURE_MODE == "full" else f"feature_store_{FEATURE_MODE}"
+feature_store = FeatureStore(FEATURE_STORE_DIR, dim=313, config=FEATURE_CACHE_CONFIG)
 
-from tqdm import tqdm
+print("Memulai ekstraksi fitur seluruh dataset...\n")
 
-X = []
-y = []
+n_added, failed_paths = feature_store.sync(
+    df_raw["filepath"].tolist(),
+    df_raw["label"].tolist(),
+    process_image_to_vector,
+    n_jobs=N_JOBS,
+    chunksize=CHUNK_SIZE
+)
 
-print("Memulai ekstraksi fitur seluruh dataset...\n")
+if failed_paths:
+    print(f"Gagal membaca {len(failed_paths)} gambar:")
+    for fp in failed_paths:
+        print(" -", fp)
 
-for fp, label in tqdm(zip(df_raw["filepath"], df_raw["label"]), total=len(df_raw)):
-    feat = process_image_to_vector(fp)
-    X.append(feat)
-    y.append(label)
+print(f"Gambar baru diekstraksi: {n_added}, baris usang dihapus: {feature_store.removed}, "
+      f"total di feature store: {len(feature_store)}")
 
-X = np.array(X)
-y = np.array(y)
+# X adalah memmap read-only: baris hanya dibaca dari disk saat diakses
+X = feature_store.features()
+y = feature_store.label_array()
 
 print("X shape:", X.shape)
 print("Contoh fitur satu gambar:", X[0][:10])
@@ -553,20 +478,28 @@ print("Label mapping:", dict(zip(le.classes_, le.transform(le.classes_))))
 
 from sklearn.model_selection import train_test_split
 
-X_train, X_temp, y_train, y_temp = train_test_split(
-    X, y_encoded,
+# Split dilakukan pada indeks baris (dipakai lagi di bawah untuk path per split).
+# Feature store hanya menghemat ekstraksi, bukan memori training: scaler dan
+# model sklearn/XGBoost butuh array di RAM, jadi X_train/X_val/X_test di bawah
+# adalah salinan baris dari memmap (totalnya sebesar X).
+idx_train, idx_temp, y_train, y_temp = train_test_split(
+    np.arange(len(y_encoded)), y_encoded,
     test_size=0.30,
     random_state=42,
     stratify=y_encoded
 )
 
-X_val, X_test, y_val, y_test = train_test_split(
-    X_temp, y_temp,
+idx_val, idx_test, y_val, y_test = train_test_split(
+    idx_temp, y_temp,
     test_size=0.50,
     random_state=42,
     stratify=y_temp
 )
 
+X_train = X[idx_train]
+X_val   = X[idx_val]
+X_test  = X[idx_test]
+
 print("Train size :", X_train.shape)
 print("Val size   :", X_val.shape)
 print("Test size  :", X_test.shape)
@@ -851,6 +784,130 @@ df_tuned = pd.DataFrame.from_dict(tuned_results, orient="index", columns=["Accur
 print("\n=== PERBANDINGAN AKURASI MODEL SETELAH TUNING ===")
 display(df_tuned.sort_values("Accuracy", ascending=False))
 
+"""# Perbandingan Mode Fitur (full vs leaf)"""
+
+# Melatih ulang XGBoost terbaik pada fitur kedua mode dengan split yang sama,
+# lalu membandingkan akurasi test dan latensi ekstraksi fitur per gambar.
+
+import time
+from functools import partial
+
+# Baris tiap feature store diurutkan ulang mengikuti path agar split identik
+split_paths = {
+    "train": [feature_store.paths[i] for i in idx_train],
+    "test": [feature_store.paths[i] for i in idx_test],
+}
+
+mode_results = {}
+for mode in ("full", "leaf"):
+    store = FeatureStore(
+        "feature_store" if mode == "full" else f"feature_store_{mode}",
+        dim=313,
+        config=feature_cache_config(target_size=(256, 256), mode=mode),
+    )
+    store.sync(
+        feature_store.paths,
+        feature_store.labels,
+        partial(process_image_to_vector, mode=mode),
+        n_jobs=N_JOBS,
+        chunksize=CHUNK_SIZE
+    )
+    rows = {p: i for i, p in enumerate(store.paths)}
+    X_mode = store.features()
+    X_tr = X_mode[[rows[p] for p in split_paths["train"]]]
+    X_te = X_mode[[rows[p] for p in split_paths["test"]]]
+
+    model_mode = XGBClassifier(tree_method="hist", random_state=42, **rand_xgb.best_params_)
+    model_mode.fit(X_tr, y_train)
+    acc = accuracy_score(y_test, model_mode.predict(X_te))
+
+    # Latensi ekstraksi (tanpa cache) pada 50 gambar test, grayscale sudah jadi
+    grays = [preprocessing.preprocess_image(cv2.imread(p)).gray for p in split_paths["test"][:50]]
+    t0 = time.perf_counter()
+    for gray in grays:
+        extract_features(gray, mode=mode)
+    ms = (time.perf_counter() - t0) / len(grays) * 1000
+
+    mode_results[mode] = {"Accuracy": acc, "Ekstraksi (ms/gambar)": ms}
+    if mode == "leaf":
+        best_xgb_leaf = model_mode
+
+df_modes = pd.DataFrame.from_dict(mode_results, orient="index")
+print("\n=== PERBANDINGAN MODE FITUR ===")
+display(df_modes)
+
+# Simpan model mode leaf; pakai di aplikasi dengan menyalinnya ke model/xgb_best_model.ubj
+joblib.dump(best_xgb_leaf, "xgb_best_model_leaf.pkl")
+from modules.model_io import export_native_model
+export_native_model(best_xgb_leaf, "xgb_best_model_leaf.ubj", mode="leaf")
+
+"""# Cascade Multi-Resolusi"""
+
+# Tier murah: model XGBoost yang dilatih pada fitur citra 128x128. Saat inferensi
+# (modules.pipeline.predict_image_cascade) fitur 256x256 hanya dihitung jika
+# prediksi tier 128 tidak yakin (CONF_THRESHOLD / MIN_CONF_MARGIN).
+
+from modules.validation import is_prediction_confident
+
+LOWRES_SIZE = 128
+
+store_low = FeatureStore(
+    f"feature_store_{LOWRES_SIZE}" if FEATURE_MODE == "full" else f"feature_store_{FEATURE_MODE}_{LOWRES_SIZE}",
+    dim=313,
+    config=feature_cache_config(target_size=(LOWRES_SIZE, LOWRES_SIZE), mode=FEATURE_MODE),
+)
+store_low.sync(
+    feature_store.paths,
+    feature_store.labels,
+    partial(process_image_to_vector, size=LOWRES_SIZE),
+    n_jobs=N_JOBS,
+    chunksize=CHUNK_SIZE
+)
+rows_low = {p: i for i, p in enumerate(store_low.paths)}
+X_low = store_low.features()
+X_low_train = X_low[[rows_low[p] for p in split_paths["train"]]]
+X_low_test = X_low[[rows_low[p] for p in split_paths["test"]]]
+
+best_xgb_low = XGBClassifier(tree_method="hist", random_state=42, **rand_xgb.best_params_)
+best_xgb_low.fit(X_low_train, y_train)
+
+# Simulasi cascade pada data test
+proba_low = best_xgb_low.predict_proba(X_low_test)
+proba_full = best_xgb.predict_proba(X_test)
+resolved_low = np.array([is_prediction_confident(p) for p in proba_low])
+proba_cascade = np.where(resolved_low[:, None], proba_low, proba_full)
+
+# Latensi per tier (preprocessing + ekstraksi + prediksi) pada 50 gambar test
+def tier_latency(model, size, paths):
+    imgs = [cv2.imread(p) for p in paths]
+    t0 = time.perf_counter()
+    for img in imgs:
+        gray = preprocessing.preprocess_image(img, (size, size)).gray
+        model.predict_proba(extract_features(gray, mode=FEATURE_MODE).reshape(1, -1))
+    return (time.perf_counter() - t0) / len(imgs)
+
+t_low = tier_latency(best_xgb_low, LOWRES_SIZE, split_paths["test"][:50])
+t_full = tier_latency(best_xgb, 256, split_paths["test"][:50])
+share_low = resolved_low.mean()
+t_cascade = t_low + (1 - share_low) * t_full
+
+df_cascade = pd.DataFrame({
+    "Accuracy": [
+        accuracy_score(y_test, proba_low.argmax(axis=1)),
+        accuracy_score(y_test, proba_full.argmax(axis=1)),
+        accuracy_score(y_test, proba_cascade.argmax(axis=1)),
+    ],
+    "Selesai di tier ini": [share_low, 1 - share_low, 1.0],
+    "Latensi (ms/gambar)": [t_low * 1000, t_full * 1000, t_cascade * 1000],
+}, index=[f"{LOWRES_SIZE}x{LOWRES_SIZE}", "256x256", "Cascade"])
+print("\n=== CASCADE MULTI-RESOLUSI ===")
+display(df_cascade)
+print(f"Rata-rata latensi dihemat: {(t_full - t_cascade) * 1000:.2f} ms/gambar")
+
+# Salin ke model/xgb_best_model_128.ubj agar aplikasi mengaktifkan cascade
+joblib.dump(best_xgb_low, f"xgb_best_model_{LOWRES_SIZE}.pkl")
+export_native_model(best_xgb_low, f"xgb_best_model_{LOWRES_SIZE}.ubj", mode=FEATURE_MODE, size=LOWRES_SIZE)
+
 """# SHAP EXPLAINABILITY"""
 
 try:
@@ -942,11 +999,17 @@ joblib.dump(best_xgb, "xgb_best_model.pkl")
 joblib.dump(scaler, "scaler.pkl")
 joblib.dump(le, "label_encoder.pkl")
 
+# Format native XGBoost: load lebih cepat dan stabil lintas versi xgboost.
+# Mode fitur ikut disimpan agar aplikasi mengekstraksi fitur dengan cara yang sama.
+from modules.model_io import export_native_model
+export_native_model(best_xgb, "xgb_best_model.ubj", mode=FEATURE_MODE)
+
 print("Models saved successfully!")
 
 
 if files is not None:
     files.download("xgb_best_model.pkl")
+    files.download("xgb_best_model.ubj")
     files.download("scaler.pkl")
     files.download("label_encoder.pkl")
     print("Files downloaded!")